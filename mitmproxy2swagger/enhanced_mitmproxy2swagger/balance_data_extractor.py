@@ -14,12 +14,15 @@ class DataExtractor(ABC):
     """数据提取器基类"""
     
     @abstractmethod
-    def can_handle(self, url: str, response_body: bytes) -> bool:
-        """判断是否能处理此类响应"""
+    def can_handle(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> bool:
+        """判断是否能处理此类响应
+
+        response_text为调用方已解码的响应文本，提供时不再重复解码response_body
+        """
         pass
     
     @abstractmethod
-    def extract_data(self, url: str, response_body: bytes) -> Dict[str, Any]:
+    def extract_data(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Dict[str, Any]:
         """提取结构化数据"""
         pass
     
@@ -84,10 +87,10 @@ class BankBalanceExtractor(DataExtractor):
             }
         }
     
-    def can_handle(self, url: str, response_body: bytes) -> bool:
+    def can_handle(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> bool:
         """判断是否为银行余额API响应"""
         try:
-            content = response_body.decode('utf-8', errors='ignore')
+            content = response_text if response_text is not None else response_body.decode('utf-8', errors='ignore')
             
             # 检查URL模式
             for bank_name, config in self.bank_patterns.items():
@@ -102,11 +105,11 @@ class BankBalanceExtractor(DataExtractor):
         except Exception:
             return False
     
-    def extract_data(self, url: str, response_body: bytes) -> Dict[str, Any]:
+    def extract_data(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Dict[str, Any]:
         """提取余额数据"""
         
         try:
-            content = response_body.decode('utf-8', errors='ignore')
+            content = response_text if response_text is not None else response_body.decode('utf-8', errors='ignore')
             
             # 识别银行类型
             bank_type = self._identify_bank(url)
@@ -214,18 +217,27 @@ class ExtractorRegistry:
         """注册数据提取器"""
         self.extractors.append(extractor)
     
-    def find_extractor(self, url: str, response_body: bytes) -> Optional[DataExtractor]:
+    def find_extractor(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Optional[DataExtractor]:
         """找到合适的数据提取器"""
+        if response_text is None:
+            response_text = response_body.decode('utf-8', errors='ignore')
         for extractor in self.extractors:
-            if extractor.can_handle(url, response_body):
+            if extractor.can_handle(url, response_body, response_text):
                 return extractor
         return None
     
-    def extract_enhanced_data(self, url: str, response_body: bytes) -> Tuple[Optional[Dict], Optional[Dict]]:
-        """提取增强数据和schema"""
-        extractor = self.find_extractor(url, response_body)
+    def extract_enhanced_data(self, url: str, response_body: bytes, response_text: Optional[str] = None,
+                              extractor: Optional[DataExtractor] = None) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """提取增强数据和schema
+
+        已通过find_extractor选定提取器时可直接传入extractor，避免重复匹配
+        """
+        if response_text is None:
+            response_text = response_body.decode('utf-8', errors='ignore')
+        if extractor is None:
+            extractor = self.find_extractor(url, response_body, response_text)
         if extractor:
-            extracted_data = extractor.extract_data(url, response_body)
+            extracted_data = extractor.extract_data(url, response_body, response_text)
             schema_enhancement = extractor.get_schema_enhancements(extracted_data)
             return extracted_data, schema_enhancement
         return None, None
@@ -38,11 +38,11 @@ except ImportError:
     # 定义基础接口
     class DataExtractor(ABC):
         @abstractmethod
-        def can_handle(self, url: str, response_body: bytes) -> bool:
+        def can_handle(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> bool:
             pass
 
         @abstractmethod
-        def extract_data(self, url: str, response_body: bytes) -> Dict[str, Any]:
+        def extract_data(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Dict[str, Any]:
             pass
 
         @abstractmethod
@@ -80,7 +80,7 @@ class EnhancedFeatureLibraryExtractor(DataExtractor):
 
         self.logger.info("✅ 增强版特征库提取器初始化完成")
 
-    def can_handle(self, url: str, response_body: bytes) -> bool:
+    def can_handle(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> bool:
         """判断是否可以处理此URL和响应 - 集成过滤逻辑"""
         try:
             # 第一步：使用特征库分析器判断价值
@@ -101,13 +101,13 @@ class EnhancedFeatureLibraryExtractor(DataExtractor):
             self.logger.error(f"判断处理能力时出错: {e}")
             return False
 
-    def extract_data(self, url: str, response_body: bytes) -> Dict[str, Any]:
+    def extract_data(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Dict[str, Any]:
         """提取数据 - 增强版处理逻辑"""
         try:
-            # 解码响应内容
-            response_content = ""
-            if response_body:
-                response_content = response_body.decode('utf-8', errors='ignore')
+            # 解码响应内容（调用方已解码时直接复用）
+            response_content = response_text
+            if response_content is None:
+                response_content = response_body.decode('utf-8', errors='ignore') if response_body else ""
 
             # 第一步：特征库分析
             analysis_result = self.analyzer.analyze_api(
@@ -401,8 +401,11 @@ class EnhancedFeatureLibraryPlugin:
         }
 
 
-# 全局插件实例
-enhanced_feature_library_plugin = EnhancedFeatureLibraryPlugin()
+# 插件类声明（供插件管理器加载）
+PLUGIN_CLASS = EnhancedFeatureLibraryPlugin
+
+# 全局插件实例：由initialize_enhanced_plugin按需创建（插件管理器通过PLUGIN_CLASS创建自己的实例，导入时不构建）
+enhanced_feature_library_plugin: Optional[EnhancedFeatureLibraryPlugin] = None
 
 
 def initialize_enhanced_plugin(features_config_path: str = None, filter_config_path: str = None) -> bool:
@@ -14,6 +14,7 @@ Feature Library Plugin - Pluggable Extension for mitmproxy2swagger
 """
 
 import os
+import re
 import sys
 import json
 import logging
@@ -34,11 +35,11 @@ except ImportError:
     # 如果没有找到，定义基础接口
     class DataExtractor(ABC):
         @abstractmethod
-        def can_handle(self, url: str, response_body: bytes) -> bool:
+        def can_handle(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> bool:
             pass
 
         @abstractmethod
-        def extract_data(self, url: str, response_body: bytes) -> Dict[str, Any]:
+        def extract_data(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Dict[str, Any]:
             pass
 
     class Rule(ABC):
@@ -55,6 +56,26 @@ from ai_analysis_features.financial_api_analyzer import FinancialAPIAnalyzer
 from filter_features.api_value_filter import APIValueFilter
 
 
+# 金融数据提取模式（模块加载时编译）：按字段类型依次尝试，JSON键值模式优先于文本模式
+_FINANCIAL_FIELD_PATTERNS = (
+    ("balance", (
+        re.compile(r'"(?:balance|余额|结余)":\s*"?([0-9,]+\.?\d*)"?', re.IGNORECASE),
+        re.compile(r'余额[：:]\s*([0-9,]+\.?\d*)', re.IGNORECASE),
+    )),
+    ("account_number", (
+        re.compile(r'"(?:accountNumber|账户号码)":\s*"([^"]+)"', re.IGNORECASE),
+        re.compile(r'账户号码[：:]\s*([^\s,]+)', re.IGNORECASE),
+    )),
+    ("amount", (
+        re.compile(r'"(?:amount|金额)":\s*"?([0-9,]+\.?\d*)"?', re.IGNORECASE),
+        re.compile(r'金额[：:]\s*([0-9,]+\.?\d*)', re.IGNORECASE),
+    )),
+)
+
+# 打码数据：连续星号、连续x、连续井号
+_MASKED_DATA_PATTERN = re.compile(r'\*{3,}|x{3,}|#{3,}', re.IGNORECASE)
+
+
 class FeatureLibraryExtractor(DataExtractor):
     """特征库数据提取器 - 实现DataExtractor接口"""
 
@@ -96,7 +117,7 @@ class FeatureLibraryExtractor(DataExtractor):
             self.logger.error(f"获取schema增强信息失败: {e}")
             return {}
 
-    def can_handle(self, url: str, response_body: bytes) -> bool:
+    def can_handle(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> bool:
         """判断是否可以处理此URL和响应"""
         try:
             # 使用特征库分析器判断是否为有价值的金融API
@@ -109,13 +130,13 @@ class FeatureLibraryExtractor(DataExtractor):
             self.logger.error(f"判断处理能力时出错: {e}")
             return False
 
-    def extract_data(self, url: str, response_body: bytes) -> Dict[str, Any]:
+    def extract_data(self, url: str, response_body: bytes, response_text: Optional[str] = None) -> Dict[str, Any]:
         """提取数据 - 核心处理逻辑"""
         try:
-            # 解码响应内容
-            response_content = ""
-            if response_body:
-                response_content = response_body.decode('utf-8', errors='ignore')
+            # 解码响应内容（调用方已解码时直接复用）
+            response_content = response_text
+            if response_content is None:
+                response_content = response_body.decode('utf-8', errors='ignore') if response_body else ""
 
             # 使用特征库分析器分析API
             analysis_result = self.analyzer.analyze_api(
@@ -158,52 +179,21 @@ class FeatureLibraryExtractor(DataExtractor):
     def _extract_financial_fields(self, url: str, content: str, analysis_result) -> Dict[str, Any]:
         """提取具体的金融字段"""
         financial_fields = {}
+        is_masked_data = self._is_masked_data
 
-        # 定义金融数据提取模式
-        patterns = {
-            "balance": [
-                r'"(?:balance|余额|结余)":\s*"?([0-9,]+\.?\d*)"?',
-                r'余额[：:]\s*([0-9,]+\.?\d*)',
-            ],
-            "account_number": [
-                r'"(?:accountNumber|账户号码)":\s*"([^"]+)"',
-                r'账户号码[：:]\s*([^\s,]+)',
-            ],
-            "amount": [
-                r'"(?:amount|金额)":\s*"?([0-9,]+\.?\d*)"?',
-                r'金额[：:]\s*([0-9,]+\.?\d*)',
-            ]
-        }
-
-        import re
-        for field_type, field_patterns in patterns.items():
+        for field_type, field_patterns in _FINANCIAL_FIELD_PATTERNS:
             for pattern in field_patterns:
-                try:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    if matches:
-                        # 过滤打码数据
-                        valid_matches = [m for m in matches if not self._is_masked_data(m)]
-                        if valid_matches:
-                            financial_fields[field_type] = valid_matches
-                            break  # 找到有效匹配就停止
-                except re.error:
-                    continue
+                # 过滤打码数据，找到有效匹配就停止
+                valid_matches = [m for m in pattern.findall(content) if not is_masked_data(m)]
+                if valid_matches:
+                    financial_fields[field_type] = valid_matches
+                    break
 
         return financial_fields
 
     def _is_masked_data(self, value: str) -> bool:
         """检测是否为打码数据"""
-        import re
-        masked_patterns = [
-            r'\*{3,}',  # 连续星号
-            r'x{3,}',   # 连续x
-            r'#{3,}',   # 连续井号
-        ]
-
-        for pattern in masked_patterns:
-            if re.search(pattern, value, re.IGNORECASE):
-                return True
-        return False
+        return _MASKED_DATA_PATTERN.search(value) is not None
 
 
 class FeatureLibraryRule(Rule):
@@ -310,8 +300,11 @@ class FeatureLibraryPlugin:
         }
 
 
-# 全局插件实例
-feature_library_plugin = FeatureLibraryPlugin()
+# 插件类声明（供插件管理器加载）
+PLUGIN_CLASS = FeatureLibraryPlugin
+
+# 全局插件实例：由initialize_plugin按需创建（插件管理器通过PLUGIN_CLASS创建自己的实例，导入时不构建）
+feature_library_plugin: Optional[FeatureLibraryPlugin] = None
 
 
 def initialize_plugin(config_path: str = None) -> bool:
@@ -319,8 +312,7 @@ def initialize_plugin(config_path: str = None) -> bool:
     global feature_library_plugin
 
     try:
-        if config_path:
-            feature_library_plugin = FeatureLibraryPlugin(config_path)
+        feature_library_plugin = FeatureLibraryPlugin(config_path)
 
         # 注册到mitmproxy2swagger系统
         success = feature_library_plugin.register_to_mitmproxy2swagger()
@@ -17,6 +17,8 @@ import sys
 import json
 import argparse
 import logging
+import queue
+import threading
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from pathlib import Path
@@ -35,6 +37,13 @@ from plugin_manager import initialize_plugin_system, plugin_manager
 from feature_library_plugin import FeatureLibraryPlugin
 
 
+# 预读队列容量：读取线程最多领先分析线程的流数量
+FLOW_PREFETCH_SIZE = 64
+
+# 预读队列结束标记
+_PREFETCH_DONE = object()
+
+
 class MitmproxySwaggerIntegrator:
     """mitmproxy2swagger集成器"""
 
@@ -134,6 +143,63 @@ class MitmproxySwaggerIntegrator:
         elif self.integration_mode == "extension":
             return self._process_extension_mode(mitm_file_path, output_file)
 
+    def _prefetch_flows(self, capture_reader: MitmproxyCaptureReader):
+        """在后台线程中读取并解码流，与调用方的分析过程重叠
+
+        读取线程通过有界队列最多领先FLOW_PREFETCH_SIZE个流；
+        分析仍在调用方线程中按文件顺序进行，结果顺序与顺序读取一致。
+
+        Yields:
+            (flow_wrapper, url, response_body)，响应体编码有问题时response_body为None
+        """
+        prefetched = queue.Queue(maxsize=FLOW_PREFETCH_SIZE)
+        stop_event = threading.Event()
+
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    prefetched.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for flow_wrapper in capture_reader.captured_requests():
+                    url = flow_wrapper.get_url()
+
+                    # 安全地获取响应体，处理编码问题
+                    try:
+                        response_body = flow_wrapper.get_response_body()
+                    except ValueError as e:
+                        if 'Invalid Content-Encoding' not in str(e):
+                            raise
+                        self.logger.warning(f"⚠️  跳过编码有问题的响应: {url}")
+                        response_body = None
+
+                    if not put((flow_wrapper, url, response_body)):
+                        return
+            except Exception as e:
+                put(e)
+            else:
+                put(_PREFETCH_DONE)
+
+        producer = threading.Thread(target=produce, name="mitm-flow-prefetch", daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = prefetched.get()
+                if item is _PREFETCH_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop_event.set()
+            producer.join()
+
     def _process_direct_mode(self, mitm_file_path: str, output_file: str) -> Dict[str, Any]:
         """直接集成模式处理"""
         results = {
@@ -151,21 +217,11 @@ class MitmproxySwaggerIntegrator:
 
             # 🎯 第一遍：收集所有流数据用于登录分析
             all_flows = []
-            for flow_wrapper in capture_reader.captured_requests():
+            for flow_wrapper, url, response_body in self._prefetch_flows(capture_reader):
                 results["processed_flows"] += 1
 
-                # 获取完整的流信息
-                url = flow_wrapper.get_url()
-
-                # 安全地获取响应体，处理编码问题
-                try:
-                    response_body = flow_wrapper.get_response_body()
-                except ValueError as e:
-                    if 'Invalid Content-Encoding' in str(e):
-                        self.logger.warning(f"⚠️  跳过编码有问题的响应: {url}")
-                        continue
-                    else:
-                        raise
+                if response_body is None:
+                    continue
 
                 # 构建流数据
                 flow_data = {
@@ -258,24 +314,15 @@ class MitmproxySwaggerIntegrator:
             # 读取mitm文件
             capture_reader = MitmproxyCaptureReader(mitm_file_path)
 
-            for flow_wrapper in capture_reader.captured_requests():
+            for flow_wrapper, url, response_body in self._prefetch_flows(capture_reader):
                 results["processed_flows"] += 1
 
-                url = flow_wrapper.get_url()
-
-                # 安全地获取响应体，处理编码问题
-                try:
-                    response_body = flow_wrapper.get_response_body()
-                except ValueError as e:
-                    if 'Invalid Content-Encoding' in str(e):
-                        self.logger.warning(f"⚠️  跳过编码有问题的响应: {url}")
-                        continue
-                    else:
-                        raise
-
                 if not response_body:
                     continue
 
+                # 响应文本在首个可处理的插件处解码一次，各插件共用
+                response_text = None
+
                 # 对每个插件执行处理
                 for plugin_name, plugin_instance in self.plugin_manager.plugins.items():
                     if hasattr(plugin_instance, 'extractor'):
@@ -283,8 +330,11 @@ class MitmproxySwaggerIntegrator:
 
                         # 检查是否可以处理
                         if extractor.can_handle(url, response_body):
+                            if response_text is None:
+                                response_text = response_body.decode('utf-8', errors='ignore')
+
                             # 提取数据
-                            extracted_data = extractor.extract_data(url, response_body)
+                            extracted_data = extractor.extract_data(url, response_body, response_text)
 
                             if extracted_data:
                                 if plugin_name not in results["plugin_results"]:
@@ -323,30 +373,23 @@ class MitmproxySwaggerIntegrator:
             # 使用现有的ExtractorRegistry处理
             capture_reader = MitmproxyCaptureReader(mitm_file_path)
 
-            for flow_wrapper in capture_reader.captured_requests():
+            for flow_wrapper, url, response_body in self._prefetch_flows(capture_reader):
                 results["processed_flows"] += 1
 
-                url = flow_wrapper.get_url()
-
-                # 安全地获取响应体，处理编码问题
-                try:
-                    response_body = flow_wrapper.get_response_body()
-                except ValueError as e:
-                    if 'Invalid Content-Encoding' in str(e):
-                        self.logger.warning(f"⚠️  跳过编码有问题的响应: {url}")
-                        continue
-                    else:
-                        raise
-
                 if not response_body:
                     continue
 
+                # 响应文本只解码一次，匹配与提取共用
+                response_text = response_body.decode('utf-8', errors='ignore')
+
                 # 使用ExtractorRegistry查找合适的提取器
-                extractor = self.extractor_registry.find_extractor(url, response_body)
+                extractor = self.extractor_registry.find_extractor(url, response_body, response_text)
 
                 if extractor:
                     # 提取增强数据
-                    extracted_data, schema_enhancement = self.extractor_registry.extract_enhanced_data(url, response_body)
+                    extracted_data, schema_enhancement = self.extractor_registry.extract_enhanced_data(
+                        url, response_body, response_text, extractor=extractor
+                    )
 
                     if extracted_data:
                         results["enhanced_responses"] += 1
@@ -12,6 +12,9 @@ Plugin Manager - Extension Plugin Management for mitmproxy2swagger
 3. 插件配置管理
 4. 插件执行协调
 5. 插件状态监控
+
+插件约定：插件模块在顶层声明 PLUGIN_CLASS = MyPlugin 指定插件类；
+未声明时依次回退到全局插件实例、initialize_plugin 初始化函数和扫描模块属性查找插件类。
 """
 
 import os
@@ -19,7 +22,7 @@ import sys
 import json
 import logging
 import importlib
-from typing import Dict, List, Any, Optional, Type
+from typing import Dict, List, Any, Optional, Tuple, Type
 from pathlib import Path
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
@@ -67,6 +70,14 @@ class PluginManager:
         self.plugins: Dict[str, Any] = {}
         self.plugin_configs: Dict[str, Dict] = {}
         
+        # 插件发现结果与按优先级排序的插件列表缓存
+        self._discovered: Optional[List[str]] = None
+        self._sorted_plugins: Optional[List[Tuple[str, Any]]] = None
+        
+        # 初始化状态：已初始化时复用上次结果
+        self._initialized = False
+        self._last_results: Dict[str, bool] = {}
+        
         # 设置日志
         self.logger = logging.getLogger(__name__)
         
@@ -101,9 +112,19 @@ class PluginManager:
         except Exception as e:
             self.logger.error(f"❌ 插件配置加载失败: {e}")
             self.plugin_configs = {}
+        
+        # 优先级可能已改变，排序缓存失效
+        self._sorted_plugins = None
     
-    def discover_plugins(self) -> List[str]:
-        """发现可用的插件"""
+    def discover_plugins(self, force: bool = False) -> List[str]:
+        """发现可用的插件
+        
+        Args:
+            force: 是否忽略缓存重新扫描插件目录
+        """
+        if self._discovered is not None and not force:
+            return self._discovered
+        
         plugins = []
         
         # 扫描插件目录中的Python文件
@@ -113,6 +134,7 @@ class PluginManager:
                 plugins.append(plugin_name)
                 self.logger.info(f"🔍 发现插件: {plugin_name}")
         
+        self._discovered = plugins
         return plugins
     
     def load_plugin(self, plugin_name: str) -> bool:
@@ -142,22 +164,26 @@ class PluginManager:
             
             # 查找插件类或初始化函数
             plugin_instance = None
+            config_path = plugin_config.get("config_path")
+            if config_path and not os.path.isabs(config_path):
+                config_path = str(self.plugins_dir / config_path)
             
-            # 方法1: 查找全局插件实例
-            if hasattr(plugin_module, f"{plugin_name.replace('_plugin', '')}_plugin"):
+            # 方法1: 使用模块声明的插件类（插件类的第一个参数为配置文件路径）
+            if getattr(plugin_module, "PLUGIN_CLASS", None) is not None:
+                plugin_instance = (plugin_module.PLUGIN_CLASS(config_path) if config_path
+                                   else plugin_module.PLUGIN_CLASS())
+            
+            # 方法2: 查找全局插件实例（按需创建的实例尚未创建时为None）
+            elif getattr(plugin_module, f"{plugin_name.replace('_plugin', '')}_plugin", None) is not None:
                 plugin_instance = getattr(plugin_module, f"{plugin_name.replace('_plugin', '')}_plugin")
             
-            # 方法2: 查找初始化函数
+            # 方法3: 查找初始化函数
             elif hasattr(plugin_module, "initialize_plugin"):
-                config_path = plugin_config.get("config_path")
-                if config_path and not os.path.isabs(config_path):
-                    config_path = str(self.plugins_dir / config_path)
-                
                 success = plugin_module.initialize_plugin(config_path)
                 if success and hasattr(plugin_module, f"{plugin_name.replace('_plugin', '')}_plugin"):
                     plugin_instance = getattr(plugin_module, f"{plugin_name.replace('_plugin', '')}_plugin")
             
-            # 方法3: 查找插件类
+            # 方法4: 扫描模块属性查找插件类
             else:
                 for attr_name in dir(plugin_module):
                     attr = getattr(plugin_module, attr_name)
@@ -169,6 +195,7 @@ class PluginManager:
             
             if plugin_instance:
                 self.plugins[plugin_name] = plugin_instance
+                self._sorted_plugins = None
                 self.logger.info(f"✅ 插件加载成功: {plugin_name}")
                 return True
             else:
@@ -187,13 +214,7 @@ class PluginManager:
         """
         results = {}
         
-        # 按优先级排序插件
-        sorted_plugins = sorted(
-            self.plugins.items(),
-            key=lambda x: self.plugin_configs.get(x[0], {}).get("priority", 999)
-        )
-        
-        for plugin_name, plugin_instance in sorted_plugins:
+        for plugin_name, plugin_instance in self.get_sorted_plugins():
             try:
                 if hasattr(plugin_instance, 'register_to_mitmproxy2swagger'):
                     success = plugin_instance.register_to_mitmproxy2swagger()
@@ -213,6 +234,15 @@ class PluginManager:
         
         return results
     
+    def get_sorted_plugins(self) -> List[Tuple[str, Any]]:
+        """获取按优先级排序的已加载插件，排序结果在插件变化前复用"""
+        if self._sorted_plugins is None:
+            self._sorted_plugins = sorted(
+                self.plugins.items(),
+                key=lambda x: self.plugin_configs.get(x[0], {}).get("priority", 999)
+            )
+        return self._sorted_plugins
+    
     def get_plugin_info(self, plugin_name: str) -> Optional[Dict[str, Any]]:
         """获取插件信息
         
@@ -244,18 +274,24 @@ class PluginManager:
         
         return plugin_list
     
-    def initialize_all_plugins(self) -> Dict[str, bool]:
+    def initialize_all_plugins(self, force: bool = False) -> Dict[str, bool]:
         """初始化所有插件（发现、加载、注册）
         
+        Args:
+            force: 是否忽略已有结果重新发现、加载和注册插件
+        
         Returns:
             Dict[str, bool]: 每个插件的初始化结果
         """
+        if self._initialized and not force:
+            return self._last_results
+        
         results = {}
         
         self.logger.info("🚀 开始初始化所有插件...")
         
         # 1. 发现插件
-        discovered_plugins = self.discover_plugins()
+        discovered_plugins = self.discover_plugins(force=force)
         self.logger.info(f"🔍 发现 {len(discovered_plugins)} 个插件")
         
         # 2. 加载插件
@@ -277,6 +313,8 @@ class PluginManager:
         
         self.logger.info(f"🎉 插件初始化完成: {successful_plugins}/{total_plugins} 成功")
         
+        self._initialized = True
+        self._last_results = results
         return results
     
     def get_status_report(self) -> Dict[str, Any]:
@@ -294,11 +332,14 @@ class PluginManager:
 plugin_manager = PluginManager()
 
 
-def initialize_plugin_system(plugins_dir: str = None) -> bool:
+def initialize_plugin_system(plugins_dir: str = None, force: bool = False) -> bool:
     """初始化插件系统
     
+    重复调用时复用已初始化的插件管理器，不会重新导入和注册插件。
+    
     Args:
         plugins_dir: 插件目录路径
+        force: 是否强制重新初始化
         
     Returns:
         bool: 是否初始化成功
@@ -306,11 +347,11 @@ def initialize_plugin_system(plugins_dir: str = None) -> bool:
     global plugin_manager
     
     try:
-        if plugins_dir:
+        if plugins_dir and (force or Path(plugins_dir).resolve() != plugin_manager.plugins_dir.resolve()):
             plugin_manager = PluginManager(plugins_dir)
         
         # 初始化所有插件
-        results = plugin_manager.initialize_all_plugins()
+        results = plugin_manager.initialize_all_plugins(force=force)
         
         # 检查是否有插件成功初始化
         successful_plugins = [name for name, success in results.items() if success]
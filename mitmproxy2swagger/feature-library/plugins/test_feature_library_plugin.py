@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""特征库插件金融字段提取测试"""
+
+import pytest
+
+import feature_library_plugin as flp
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return flp.FeatureLibraryExtractor()
+
+
+def _extract(extractor, text):
+    return extractor._extract_financial_fields("https://bank.example/api", text, None)
+
+
+def test_json_key_patterns_keep_original_literals(extractor):
+    text = '{"balance": 1234.50, "items": [{"amount": "0.10"}], "accountNumber": "123-456"}'
+    assert _extract(extractor, text) == {
+        "balance": ["1234.50"],
+        "account_number": ["123-456"],
+        "amount": ["0.10"],
+    }
+
+
+def test_text_patterns_used_when_json_keys_missing(extractor):
+    text = '{"data": {"desc": "余额：100 金额：5"}}'
+    assert _extract(extractor, text) == {"balance": ["100"], "amount": ["5"]}
+
+
+def test_masked_values_fall_back_to_text_patterns(extractor):
+    text = '{"accountNumber": "****", "text": "账户号码：62220001 已绑定"}'
+    assert _extract(extractor, text) == {"account_number": ["62220001"]}
+
+
+def test_no_financial_fields(extractor):
+    assert _extract(extractor, '{"a": [1, 2, {"b": "c"}]}') == {}
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""插件管理器加载顺序测试"""
+
+import json
+import sys
+
+import pytest
+
+from plugin_manager import PluginManager
+
+
+DEMO_PLUGIN = '''
+class DemoPlugin:
+    def __init__(self, config_path=None):
+        self.config_path = config_path
+        self.source = "class"
+
+    def get_plugin_info(self):
+        return {"name": "DemoPlugin"}
+
+    def register_to_mitmproxy2swagger(self):
+        return True
+
+
+PLUGIN_CLASS = DemoPlugin
+
+demo_plugin = DemoPlugin()
+demo_plugin.source = "global"
+
+
+def initialize_plugin(config_path=None):
+    raise AssertionError("声明了PLUGIN_CLASS时不应调用initialize_plugin")
+'''
+
+
+@pytest.fixture
+def plugins_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "plugins"
+    directory.mkdir()
+    (directory / "demo_plugin.py").write_text(DEMO_PLUGIN, encoding="utf-8")
+    (directory / "plugins_config.json").write_text(
+        json.dumps({"demo_plugin": {"enabled": True, "config_path": "demo.json", "priority": 1}}),
+        encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("plugins", "plugins.demo_plugin"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return directory
+
+
+def test_plugin_class_takes_precedence(plugins_dir):
+    manager = PluginManager(str(plugins_dir))
+    assert manager.load_plugin("demo_plugin")
+
+    plugin = manager.plugins["demo_plugin"]
+    assert plugin.source == "class"
+    assert plugin.config_path == str(plugins_dir / "demo.json")
+
+
+def test_reloading_configs_resorts_plugins(plugins_dir):
+    manager = PluginManager(str(plugins_dir))
+    manager.plugins = {"a_plugin": object(), "b_plugin": object()}
+    manager.plugin_configs = {"a_plugin": {"priority": 1}, "b_plugin": {"priority": 2}}
+    assert [name for name, _ in manager.get_sorted_plugins()] == ["a_plugin", "b_plugin"]
+
+    (plugins_dir / "plugins_config.json").write_text(
+        json.dumps({"a_plugin": {"priority": 2}, "b_plugin": {"priority": 1}}), encoding="utf-8")
+    manager.load_plugin_configs()
+    assert [name for name, _ in manager.get_sorted_plugins()] == ["b_plugin", "a_plugin"]
+
+
+def test_loading_bundled_plugin_constructs_one_instance(monkeypatch):
+    import feature_library_plugin
+
+    # 导入模块时不构建全局实例，插件管理器通过PLUGIN_CLASS创建唯一的实例
+    assert feature_library_plugin.feature_library_plugin is None
+
+    created = []
+    original_init = feature_library_plugin.FeatureLibraryPlugin.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created.append(self)
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(feature_library_plugin.FeatureLibraryPlugin, "__init__", counting_init)
+    monkeypatch.setitem(sys.modules, "plugins.feature_library_plugin", feature_library_plugin)
+
+    manager = PluginManager()
+    assert manager.load_plugin("feature_library_plugin")
+    assert created == [manager.plugins["feature_library_plugin"]]
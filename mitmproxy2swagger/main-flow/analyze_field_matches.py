@@ -7,15 +7,160 @@ Analyze field matches in captured traffic files
 import json
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
-from mitmproxy import io, http
-from mitmproxy.exceptions import FlowReadException
 import re
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+# pyahocorasick为可选依赖：可用时一次扫描匹配全部字段，否则逐个做子串查找
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# orjson为可选依赖：可用时用于解析响应和写出结果，否则使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 每个字段最多保留的上下文数量
+MAX_CONTEXTS = 3
+
+# 响应不是完整JSON时 parse_json_document 的返回值（区别于合法的 null）
+_NOT_JSON = object()
+
+# 搜索串超过该数量时才使用Aho-Corasick自动机：搜索串较少时逐个做字节子串查找更快
+# （自动机需要把响应解码为字符串并逐个产出命中，3个搜索串时约慢3~8倍，8个时仍慢约3倍）
+AHOCORASICK_MIN_NEEDLES = 16
+
+# 读取mitm文件的缓冲区大小
+FLOW_READ_BUFFER_SIZE = 1 << 20
+
+# 需要分析的文本类响应类型，其余（图片、二进制流等）不会包含目标字段
+TEXT_CONTENT_TYPES = ('json', 'text', 'xml', 'javascript', 'form-urlencoded', 'html')
+
+def is_text_content_type(content_type: str) -> bool:
+    """判断响应类型是否需要分析；未声明类型的响应按文本处理"""
+    if not content_type:
+        return True
+    content_type = content_type.lower()
+    return any(t in content_type for t in TEXT_CONTENT_TYPES)
+
+def prepare_patterns(patterns: dict) -> dict:
+    """预处理字段模式，缓存编码后的搜索串，避免每个流重复计算"""
+    prepared = {}
+    for field_name, pattern_info in patterns.items():
+        pattern_info = dict(pattern_info)
+        search_value = pattern_info.get('value', '').strip('"')
+        pattern_info['_search_value'] = search_value
+        pattern_info['_needle'] = search_value.encode('utf-8')
+        pattern_info['_json_re'], pattern_info['_kv_re'] = compile_context_patterns(search_value)
+        prepared[field_name] = pattern_info
+    return prepared
+
+def compile_context_patterns(field_name: str) -> tuple:
+    """编译提取字段上下文用的正则：(包含字段的平铺JSON对象, 字段的字符串键值对)"""
+    escaped = re.escape(field_name)
+    return (
+        re.compile(r'\{[^{}]*"' + escaped + r'"[^{}]*\}'),
+        re.compile(r'"' + escaped + r'":\s*"[^"]*"'),
+    )
+
+@lru_cache(maxsize=None)
+def compile_combined_kv_pattern(field_names: tuple):
+    """把所有字段的键值对正则合并为一个分支，group(1) 为命中的字段名"""
+    alternation = '|'.join(re.escape(name) for name in sorted(field_names, key=len, reverse=True))
+    return re.compile(r'"(' + alternation + r')":\s*"[^"]*"')
+
+def find_kv_contexts(content: str, field_names: tuple) -> dict:
+    """一次扫描提取所有字段的字符串键值对，按字段名分组"""
+    grouped = defaultdict(list)
+    for match in compile_combined_kv_pattern(field_names).finditer(content):
+        grouped[match.group(1)].append(match.group(0))
+    return grouped
+
+def build_field_scanner(patterns: dict):
+    """构建字段扫描函数：输入响应字节，返回命中的 contains 字段名集合
+
+    搜索串超过 AHOCORASICK_MIN_NEEDLES 个且有 pyahocorasick 时，所有搜索串合并为一个自动机，
+    对响应只扫描一遍；字节按 latin-1 一一映射为字符串后扫描，搜索串同样按其UTF-8字节映射。
+    否则逐个在字节上做子串查找。
+    """
+    needles = {
+        field_name: pattern_info['_needle']
+        for field_name, pattern_info in patterns.items()
+        if pattern_info.get('type', 'contains') == 'contains' and pattern_info['_needle']
+    }
 
-def analyze_response_content(content: str, patterns: dict) -> dict:
-    """分析响应内容中的模式匹配"""
+    if ahocorasick is None or len(needles) <= AHOCORASICK_MIN_NEEDLES:
+        def scan(content: bytes) -> set:
+            return {field_name for field_name, needle in needles.items() if needle in content}
+        return scan
+
+    automaton = ahocorasick.Automaton()
+    for field_name, needle in needles.items():
+        key = needle.decode('latin-1')
+        if automaton.exists(key):
+            automaton.get(key).add(field_name)
+        else:
+            automaton.add_word(key, {field_name})
+    automaton.make_automaton()
+    total = len(needles)
+
+    def scan(content: bytes) -> set:
+        found = set()
+        for _, field_names in automaton.iter(content.decode('latin-1')):
+            found |= field_names
+            if len(found) == total:
+                break
+        return found
+    return scan
+
+def analyze_response_content(content: bytes, patterns: dict, get_text=None, scan=None,
+                             skip_context_fields=frozenset()) -> dict:
+    """分析响应内容中的模式匹配
+
+    Args:
+        content: 响应体字节，直接在字节上做包含判断
+        patterns: 经 prepare_patterns 预处理的字段模式
+        get_text: 返回响应文本的回调，仅在需要提取上下文时调用一次；默认按UTF-8解码
+        scan: build_field_scanner 构建的扫描函数，未提供时临时构建
+        skip_context_fields: 只统计匹配、不再提取上下文的字段
+
+    Returns:
+        命中字段到匹配信息的映射，未命中的字段不出现在结果中
+    """
     matches = {}
+    text = None
+    kv_contexts = None
+    json_data = None
+    json_loaded = False
+    if scan is None:
+        scan = build_field_scanner(patterns)
+    hit_fields = scan(content)
+
+    def load_kv_contexts():
+        # 同一响应的键值对回退只扫描一遍，结果供所有字段共用
+        nonlocal kv_contexts
+        if kv_contexts is None:
+            field_names = tuple(
+                info['_search_value'] for info in patterns.values()
+                if info.get('type', 'contains') == 'contains' and info['_search_value']
+            )
+            kv_contexts = find_kv_contexts(text, field_names)
+        return kv_contexts
+
+    def load_json():
+        # 同一响应只整体解析一次，解析结果（包括解析失败）供所有字段共用
+        nonlocal json_data, json_loaded
+        if not json_loaded:
+            json_data = parse_json_document(text, content)
+            json_loaded = True
+        return json_data
 
     for field_name, pattern_info in patterns.items():
         pattern_type = pattern_info.get('type', 'contains')
@@ -23,13 +168,15 @@ def analyze_response_content(content: str, patterns: dict) -> dict:
         invert = pattern_info.get('invert', False)
 
         if pattern_type == 'contains':
-            # 移除引号进行匹配
-            search_value = pattern_value.strip('"')
-            found = search_value in content
+            found = field_name in hit_fields
 
             if invert:
                 found = not found
 
+            # 只为命中的字段构建匹配信息
+            if not found:
+                continue
+
             matches[field_name] = {
                 'found': found,
                 'pattern': pattern_value,
@@ -38,112 +185,199 @@ def analyze_response_content(content: str, patterns: dict) -> dict:
             }
 
             # 如果找到匹配，尝试提取上下文
-            if found and not invert:
+            if not invert and field_name not in skip_context_fields:
+                if text is None:
+                    text = get_text() if get_text else content.decode('utf-8', errors='replace')
+                if not text:
+                    continue
+
                 # 查找包含该字段的JSON片段
-                json_contexts = extract_json_contexts(content, search_value)
+                json_contexts = extract_json_contexts(
+                    text, pattern_info['_search_value'], content,
+                    (pattern_info['_json_re'], pattern_info['_kv_re']),
+                    load_kv_contexts, load_json
+                )
                 if json_contexts:
-                    matches[field_name]['contexts'] = json_contexts[:3]  # 最多3个上下文
+                    matches[field_name]['contexts'] = json_contexts[:MAX_CONTEXTS]
 
     return matches
 
-def extract_json_contexts(content: str, field_name: str) -> list:
-    """提取包含指定字段的JSON上下文"""
+def parse_json_document(content: str, raw: bytes = None):
+    """整体解析响应为JSON（orjson 可直接解析原始字节），不是完整JSON时返回 _NOT_JSON"""
+    try:
+        if orjson is not None:
+            return orjson.loads(raw if raw is not None else content)
+        return json.loads(content)
+    except (ValueError, TypeError, RecursionError):
+        return _NOT_JSON
+
+def extract_json_contexts(content: str, field_name: str, raw: bytes = None, context_patterns: tuple = None,
+                          load_kv_contexts=None, load_json=None) -> list:
+    """提取包含指定字段的JSON上下文
+
+    context_patterns 为 compile_context_patterns 预编译的正则，未提供时临时编译。
+    load_kv_contexts 返回 find_kv_contexts 的分组结果，用于多个字段共用一次键值对扫描；
+    load_json 返回 parse_json_document 的解析结果，用于多个字段共用一次整体解析。
+    """
     contexts = []
 
     # 尝试解析整个响应为JSON
-    try:
-        json_data = json.loads(content)
+    json_data = load_json() if load_json is not None else parse_json_document(content, raw)
+    if json_data is not _NOT_JSON:
         contexts.extend(find_field_in_json(json_data, field_name))
-    except:
-        # 如果不是完整JSON，尝试查找JSON片段
-        json_pattern = r'\{[^{}]*"' + re.escape(field_name) + r'"[^{}]*\}'
-        matches = re.finditer(json_pattern, content)
+    else:
+        json_re, kv_re = context_patterns or compile_context_patterns(field_name)
 
-        for match in matches:
+        # 如果不是完整JSON，尝试查找JSON片段，收集够上下文即返回
+        for match in json_re.finditer(content):
             try:
                 json_fragment = json.loads(match.group())
                 contexts.append(json_fragment)
-            except:
+            except ValueError:
                 # 如果JSON片段无效，保存原始文本
                 contexts.append(match.group())
+            if len(contexts) >= MAX_CONTEXTS:
+                return contexts
 
         if len(contexts) == 0:
             # 查找简单的键值对
-            simple_pattern = r'"' + re.escape(field_name) + r'":\s*"[^"]*"'
-            simple_matches = re.findall(simple_pattern, content)
-            contexts.extend(simple_matches[:3])
+            if load_kv_contexts is not None:
+                simple_matches = load_kv_contexts().get(field_name, [])
+            else:
+                simple_matches = kv_re.findall(content)
+            contexts.extend(simple_matches[:MAX_CONTEXTS])
 
     return contexts
 
 def find_field_in_json(data, field_name: str, path: str = "") -> list:
-    """递归查找JSON中的字段"""
+    """查找JSON中的字段（显式栈迭代遍历，按文档顺序先序输出）"""
     results = []
+    stack = [(data, path)]
 
-    if isinstance(data, dict):
-        for key, value in data.items():
-            current_path = f"{path}.{key}" if path else key
+    while stack:
+        node, node_path = stack.pop()
 
-            if key == field_name:
+        if isinstance(node, dict):
+            if field_name in node:
                 results.append({
-                    'path': current_path,
-                    'value': value,
-                    'context': {k: v for k, v in data.items() if k != field_name}
+                    'path': f"{node_path}.{field_name}" if node_path else field_name,
+                    'value': node[field_name],
+                    'context': {k: v for k, v in node.items() if k != field_name}
                 })
 
-            if isinstance(value, (dict, list)):
-                results.extend(find_field_in_json(value, field_name, current_path))
-
-    elif isinstance(data, list):
-        for i, item in enumerate(data):
-            current_path = f"{path}[{i}]" if path else f"[{i}]"
-            if isinstance(item, (dict, list)):
-                results.extend(find_field_in_json(item, field_name, current_path))
+            # 只为容器类型生成子路径，逆序入栈以保持文档顺序
+            children = [
+                (value, f"{node_path}.{key}" if node_path else key)
+                for key, value in node.items()
+                if isinstance(value, (dict, list))
+            ]
+            stack.extend(reversed(children))
+
+        elif isinstance(node, list):
+            children = [
+                (item, f"{node_path}[{i}]" if node_path else f"[{i}]")
+                for i, item in enumerate(node)
+                if isinstance(item, (dict, list))
+            ]
+            stack.extend(reversed(children))
 
     return results
 
+def new_match_columns() -> dict:
+    """单个字段的命中记录，按列存储（每列一个列表，第 i 行对应第 i 次命中）"""
+    return {
+        'url': [],
+        'method': [],
+        'status_code': [],
+        'content_type': [],
+        'response_size': [],
+        'match_info': []
+    }
+
 def analyze_mitm_file(file_path: str, patterns: dict) -> dict:
     """分析单个mitm文件"""
+    # mitmproxy 导入开销大，仅在实际分析文件时加载
+    from mitmproxy import io, http
+    from mitmproxy.exceptions import FlowReadException
+
     print(f"\n🔍 分析文件: {file_path}")
 
     results = {
         'file_path': file_path,
         'total_flows': 0,
         'analyzed_responses': 0,
-        'field_matches': defaultdict(list),
-        'summary': defaultdict(int)
+        'field_matches': defaultdict(new_match_columns),
+        'summary': Counter()
     }
+    scan = build_field_scanner(patterns)
+
+    # 每个字段已收集的上下文数，收集够后该字段只计数不再提取上下文
+    contexts_collected = Counter()
+    saturated_fields = set()
 
     try:
-        with open(file_path, "rb") as f:
+        with open(file_path, "rb", buffering=FLOW_READ_BUFFER_SIZE) as f:
             flow_reader = io.FlowReader(f)
 
+            # 循环内频繁访问的对象和方法预先绑定为局部变量
+            HTTPFlow = http.HTTPFlow
+            field_matches = results['field_matches']
+            update_summary = results['summary'].update
+            total_flows = 0
+            analyzed_responses = 0
+
             for flow in flow_reader.stream():
-                if isinstance(flow, http.HTTPFlow):
-                    results['total_flows'] += 1
-
-                    # 分析响应
-                    if flow.response and flow.response.content:
-                        try:
-                            response_text = flow.response.get_text()
-                            if response_text:
-                                results['analyzed_responses'] += 1
-
-                                # 分析字段匹配
-                                matches = analyze_response_content(response_text, patterns)
-
-                                for field_name, match_info in matches.items():
-                                    if match_info['found']:
-                                        results['field_matches'][field_name].append({
-                                            'url': flow.request.pretty_url,
-                                            'method': flow.request.method,
-                                            'status_code': flow.response.status_code,
-                                            'content_type': flow.response.headers.get('content-type', ''),
-                                            'match_info': match_info,
-                                            'response_size': len(response_text)
-                                        })
-                                        results['summary'][field_name] += 1
-                        except Exception as e:
-                            print(f"   ⚠️  响应解析错误: {e}")
+                if not isinstance(flow, HTTPFlow):
+                    continue
+                total_flows += 1
+
+                # 分析文本类响应（在字节上匹配，仅在提取上下文时才解码为文本）
+                resp = flow.response
+                if resp is None or not resp.raw_content:
+                    continue
+                content_type = resp.headers.get('content-type', '')
+                if not is_text_content_type(content_type):
+                    continue
+
+                try:
+                    # content 每次访问都会按 Content-Encoding 解码，只取一次
+                    response_body = resp.content
+                    if not response_body:
+                        continue
+                    analyzed_responses += 1
+
+                    # 分析字段匹配
+                    matches = analyze_response_content(
+                        response_body, patterns, resp.get_text, scan, saturated_fields
+                    )
+
+                    if not matches:
+                        continue
+                    update_summary(matches.keys())
+
+                    req = flow.request
+                    url = req.pretty_url
+                    method = req.method
+                    status_code = resp.status_code
+                    response_size = len(response_body)
+
+                    for field_name, match_info in matches.items():
+                        if 'contexts' in match_info:
+                            contexts_collected[field_name] += len(match_info['contexts'])
+                            if contexts_collected[field_name] >= MAX_CONTEXTS:
+                                saturated_fields.add(field_name)
+                        columns = field_matches[field_name]
+                        columns['url'].append(url)
+                        columns['method'].append(method)
+                        columns['status_code'].append(status_code)
+                        columns['content_type'].append(content_type)
+                        columns['response_size'].append(response_size)
+                        columns['match_info'].append(match_info)
+                except Exception as e:
+                    print(f"   ⚠️  响应解析错误: {e}")
+
+            results['total_flows'] = total_flows
+            results['analyzed_responses'] = analyzed_responses
 
     except FlowReadException as e:
         print(f"   ❌ 文件读取错误: {e}")
@@ -227,8 +461,18 @@ def main():
     all_results = []
     overall_summary = defaultdict(int)
 
-    for mitm_file in sorted(mitm_files):
-        result = analyze_mitm_file(str(mitm_file), patterns)
+    # 各文件相互独立，多文件时分发到进程池并行分析（结果按文件名顺序汇总）
+    prepared_patterns = prepare_patterns(patterns)
+    file_paths = [str(mitm_file) for mitm_file in sorted(mitm_files)]
+    max_workers = min(len(file_paths), os.cpu_count() or 1)
+
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            file_results = list(executor.map(analyze_mitm_file, file_paths, repeat(prepared_patterns)))
+    else:
+        file_results = [analyze_mitm_file(file_path, prepared_patterns) for file_path in file_paths]
+
+    for result in file_results:
         if result:
             all_results.append(result)
             for field_name, count in result['summary'].items():
@@ -254,25 +498,28 @@ def main():
         print(f"  • {field_name}: {count} 次匹配 ({percentage:.1f}%)")
 
     # 保存详细结果
-    try:
-        import pandas as pd
-        timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-    except:
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     output_file = current_dir / 'data' / f'field_match_analysis_{timestamp}.json'
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'analysis_timestamp': timestamp,
-            'patterns': patterns,
-            'overall_summary': dict(overall_summary),
-            'total_files': len(all_results),
-            'total_flows': total_flows,
-            'total_responses': total_responses,
-            'detailed_results': all_results
-        }, f, indent=2, ensure_ascii=False)
+    report = {
+        'analysis_timestamp': timestamp,
+        'patterns': patterns,
+        'overall_summary': dict(overall_summary),
+        'total_files': len(all_results),
+        'total_flows': total_flows,
+        'total_responses': total_responses,
+        'detailed_results': all_results
+    }
+
+    # 一次性序列化为UTF-8字节后以二进制写出，避免文本写入层逐块再编码
+    if orjson is not None:
+        payload = orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(report, indent=2, ensure_ascii=False).encode('utf-8')
+
+    with open(output_file, 'wb') as f:
+        f.write(payload)
 
     print(f"\n💾 详细结果已保存到: {output_file}")
 
@@ -10,7 +10,7 @@ Dynamic Configuration Manager - Real-time Discovery
 4. 环境变量覆盖支持
 
 发现方式：
-1. ps命令扫描mitmproxy进程
+1. 扫描mitmproxy进程（Linux读取/proc，其他平台使用psutil或ps命令）
 2. 解析--listen-host和--listen-port参数
 3. 常用端口扫描测试
 4. HTTP接口验证(/flows/dump)
@@ -20,22 +20,154 @@ import os
 import json
 import subprocess
 import re
+import errno
+import select
 import socket
-import requests
+import time
+import tempfile
 import logging
-from typing import Dict, Any, Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple, List, Sequence, Set
 from pathlib import Path
 
+# psutil为可选依赖，仅在没有/proc的平台上用于枚举进程
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 logger = logging.getLogger(__name__)
 
+# 超时设置（秒）：连接超时短以快速排除不可达端点，读取超时给慢速mitmweb留出余量
+_CONNECT_TIMEOUT = 0.3
+_READ_TIMEOUT = 1.0
+_PS_TIMEOUT = 3.0
+
+# 常用端点HTTP验证阶段的最大并发线程数
+SCAN_MAX_WORKERS = 16
+
+# 常用主机地址（按优先级排序）
+_COMMON_HOSTS = (
+    "127.0.0.1",     # 最常用的本地地址
+    "localhost",     # 本地地址别名
+    "10.10.12.249",  # 从当前进程发现的地址
+    "10.10.11.28",   # 用户提到的实际地址
+    "0.0.0.0",       # 监听所有接口
+    "10.10.10.146",  # 配置文件中的地址
+)
+
+# 常用端口（按使用频率排序，优先mitmweb管理端口）
+_COMMON_PORTS = (8082, 8080, 8081, 9999, 9090, 8888, 3128)
+
+# 最可能的组合，优先测试（优先mitmweb管理端口）
+_PRIORITY_COMBOS = (
+    ("10.10.12.249", 8082),  # 当前发现的mitmweb管理端口
+    ("127.0.0.1", 8082),     # 本地mitmweb管理端口
+    ("localhost", 8082),     # 本地别名
+    ("10.10.12.249", 9999),  # 代理端口作为备选
+)
+_PRIORITY_SET = frozenset(_PRIORITY_COMBOS)
+
+# 全面扫描阶段的组合，跳过已在优先阶段测试过的组合
+_REMAINING_COMBOS = tuple(
+    (host, port)
+    for host in _COMMON_HOSTS
+    for port in _COMMON_PORTS
+    if (host, port) not in _PRIORITY_SET
+)
+
+# requests导入开销较大，只在真正需要HTTP探测时才导入（走环境变量或缓存时无需加载）
+@lru_cache(maxsize=1)
+def _get_session():
+    """获取探测请求共用的HTTP会话，连接池在多次探测间复用，探测失败不重试"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=SCAN_MAX_WORKERS,
+                                         pool_maxsize=SCAN_MAX_WORKERS,
+                                         max_retries=0))
+    return session
+
+# 发现结果的磁盘缓存：频繁重启的命令行进程在有效期内只需一次连接验证
+_CACHE_PATH = Path(tempfile.gettempdir()) / 'mitm_discovery.json'
+_CACHE_TTL = 60  # 秒
+
+# 发现失败后的重试间隔：间隔内的取值（如先取host再取port）不重复扫描，过期后重新发现
+_DISCOVERY_RETRY_INTERVAL = 10  # 秒
+
+# 响应内容中的mitmproxy特征，直接在原始字节上匹配，无需解码和转小写
+_MITM_SIG = re.compile(rb'mitm(?:proxy|web)', re.IGNORECASE)
+
+# mitmproxy进程参数解析用的预编译正则：各参数合并为一个带命名分组的交替式，一次扫描完成
+#   lh: --listen-host    wh: --set web_host（mitmweb特有）
+#   wp: --set web_port（mitmweb管理端口）    lp: --listen-port（代理端口）    p: -p
+_RE_MITM_ARGS = re.compile(
+    r'--listen-host[=\s]+(?P<lh>\S+)'
+    r'|--set\s+web_host[=:](?P<wh>\S+)'
+    r'|--set\s+web_port[=:](?P<wp>\d+)'
+    r'|--listen-port[=\s]+(?P<lp>\d+)'
+    r'|(?:^|\s)-p\s+(?P<p>\d+)'
+)
+
+def _check_mitmweb(host: str, port: int) -> bool:
+    """测试mitmproxy连接是否可用"""
+    import requests
+
+    try:
+        # 直接访问mitmweb接口，短连接超时即可快速排除不可达端点，无需单独的TCP预探测
+        # 先尝试访问根路径，通常更轻量
+        test_url = f"http://{host}:{port}/"
+        # 连接与读取分别设置超时：连接失败快速返回，读取留出响应时间
+        # 流式请求，只读取响应开头部分，避免下载并解码非mitm服务的完整页面
+        with _get_session().get(test_url, timeout=(_CONNECT_TIMEOUT, _READ_TIMEOUT), stream=True) as response:
+            # 检查是否是mitmweb（通过响应头或内容特征）
+            if response.status_code == 200:
+                # 检查响应头中的Server字段
+                server_header = response.headers.get('Server', '').lower()
+                if 'mitmproxy' in server_header:
+                    logger.debug(f"✅ mitmweb验证成功: {host}:{port} (Server: {server_header})")
+                    return True
+
+                # 检查响应内容是否包含mitmproxy特征
+                head = response.raw.read(1024, decode_content=True)
+                if _MITM_SIG.search(head):
+                    logger.debug(f"✅ mitmweb验证成功: {host}:{port} (内容特征匹配)")
+                    return True
+
+            logger.debug(f"❌ 不是mitmweb服务: {host}:{port} -> {response.status_code}")
+            return False
+
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        logger.debug(f"❌ 端点不可达: {host}:{port} -> {e}")
+        return False
+    except requests.exceptions.RequestException as e:
+        logger.debug(f"❌ HTTP请求失败: {host}:{port} -> {e}")
+        return False
+    except Exception as e:
+        logger.debug(f"连接测试失败 {host}:{port}: {e}")
+        return False
+
+
+@lru_cache(maxsize=128)
+def _probe(host: str, port: int) -> bool:
+    """发现过程中使用的端点验证，同一次发现内相同端点只实际探测一次"""
+    return _check_mitmweb(host, port)
+
+
 class DynamicConfig:
     """动态配置管理器 - 实时发现mitmproxy实例"""
 
     def __init__(self, config_file: str = "config.json"):
         self.config_file = config_file
         self.config_data = {}
+        # 点号分隔键路径到值的扁平索引，在加载配置时构建
+        self._flat = {}
         self._discovered_host = None
         self._discovered_port = None
+        # 最近一次尝试发现的时间（time.monotonic），失败后在重试间隔内不重复扫描
+        self._discovery_attempted_at = None
         self.load_config()
 
     def load_config(self):
@@ -52,21 +184,58 @@ class DynamicConfig:
             logger.error(f"❌ 配置文件加载失败: {e}")
             self.config_data = {}
 
-    def discover_running_mitmproxy(self) -> Tuple[Optional[str], Optional[int]]:
+        self._flat = {}
+        if isinstance(self.config_data, dict):
+            self._flatten_config(self.config_data, '')
+
+    def _flatten_config(self, data: Dict[str, Any], prefix: str):
+        """把嵌套配置展开为 {"a.b.c": 值} 形式，中间层的字典同样保留"""
+        for key, value in data.items():
+            key_path = f"{prefix}{key}"
+            self._flat[key_path] = value
+            if isinstance(value, dict):
+                self._flatten_config(value, key_path + '.')
+
+    def discover_running_mitmproxy(self, use_cache: bool = True) -> Tuple[Optional[str], Optional[int]]:
         """
         动态发现正在运行的mitmproxy实例
+        参数: use_cache 是否先使用磁盘缓存中未过期的发现结果
         返回: (host, port) 或 (None, None)
         """
+        self._discovery_attempted_at = time.monotonic()
+
+        # 环境变量已完整指定时，取值方法总是优先使用环境变量，无需再发现
+        env_host = os.getenv('MITM_HOST')
+        env_port = os.getenv('MITM_PORT')
+        if env_host and env_port:
+            try:
+                port = int(env_port)
+                logger.info(f"使用环境变量指定的mitmproxy，跳过动态发现: {env_host}:{port}")
+                return env_host, port
+            except ValueError:
+                logger.warning(f"环境变量MITM_PORT无效: {env_port}")
+
         logger.info("🔍 开始动态发现运行中的mitmproxy实例...")
+        # 探测结果只在单次发现过程内有效
+        _probe.cache_clear()
+
+        # 磁盘缓存 - 有效期内的结果只需验证一次连接
+        if use_cache:
+            cached = self._load_cached_discovery()
+            if cached and _probe(*cached):
+                host, port = cached
+                logger.info(f"✅ 使用缓存的发现结果: {host}:{port}")
+                self._discovered_host = host
+                self._discovered_port = port
+                return host, port
 
         # 快速固定配置 - 直接使用已知的mitmproxy配置
         known_host = "10.10.12.249"
         known_port = 8082
 
-        if self._test_mitmproxy_connection(known_host, known_port):
+        if _probe(known_host, known_port):
             logger.info(f"✅ 使用固定配置发现mitmproxy: {known_host}:{known_port}")
-            self._discovered_host = known_host
-            self._discovered_port = known_port
+            self._remember_discovery(known_host, known_port)
             return known_host, known_port
 
         # 方法1: 扫描mitmproxy进程（作为备选）
@@ -74,93 +243,124 @@ class DynamicConfig:
         if result:
             host, port = result
             logger.info(f"✅ 通过进程扫描发现mitmproxy: {host}:{port}")
-            self._discovered_host = host
-            self._discovered_port = port
+            self._remember_discovery(host, port)
+            return host, port
+
+        # 方法2: 扫描常用的主机端口组合（进程不可见时，如mitmproxy运行在其他容器或主机上）
+        result = self._scan_common_endpoints()
+        if result:
+            host, port = result
+            logger.info(f"✅ 通过端点扫描发现mitmproxy: {host}:{port}")
+            self._remember_discovery(host, port)
             return host, port
 
         logger.warning("❌ 未发现运行中的mitmproxy实例")
         return None, None
 
-    def _scan_mitmproxy_processes(self) -> Optional[Tuple[str, int]]:
-        """扫描运行中的mitmproxy相关进程"""
-        try:
-            # 使用更高效的ps命令，直接过滤mitmproxy进程
-            result = subprocess.run(
-                ['ps', '-ef'],
-                capture_output=True,
-                text=True,
-                timeout=5  # 减少超时时间
-            )
-
-            if result.returncode != 0:
-                return None
-
-            # 先用grep过滤，提高效率
-            grep_result = subprocess.run(
-                ['grep', 'mitm'],
-                input=result.stdout,
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
+    def _remember_discovery(self, host: str, port: int):
+        """记录发现结果并写入磁盘缓存"""
+        self._discovered_host = host
+        self._discovered_port = port
 
-            if grep_result.returncode != 0:
+        try:
+            # 先写临时文件再替换，避免并发进程读到半截内容
+            fd, tmp_path = tempfile.mkstemp(dir=_CACHE_PATH.parent, prefix='.mitm_discovery.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"host": host, "port": port, "ts": time.time()}, f)
+            os.replace(tmp_path, _CACHE_PATH)
+        except OSError as e:
+            logger.debug(f"写入发现缓存失败: {e}")
+
+    def _load_cached_discovery(self) -> Optional[Tuple[str, int]]:
+        """读取未过期的磁盘缓存发现结果"""
+        try:
+            if time.time() - _CACHE_PATH.stat().st_mtime >= _CACHE_TTL:
                 return None
+            with open(_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            return cached['host'], int(cached['port'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
 
-            for line in grep_result.stdout.split('\n'):
-                if line.strip() and not line.strip().endswith('grep mitm'):
-                    logger.debug(f"发现mitmproxy进程: {line.strip()}")
+    def _scan_mitmproxy_processes(self) -> Optional[Tuple[str, int]]:
+        """扫描运行中的mitmproxy相关进程"""
+        try:
+            for line in self._iter_mitm_process_lines():
+                logger.debug(f"发现mitmproxy进程: {line}")
 
-                    # 解析监听地址参数
-                    host, port = self._parse_mitm_args(line)
-                    if host and port:
-                        logger.info(f"✅ 从进程参数解析到: {host}:{port}")
-                        return host, port
+                # 解析监听地址参数
+                host, port = self._parse_mitm_args(line)
+                if host and port:
+                    logger.info(f"✅ 从进程参数解析到: {host}:{port}")
+                    return host, port
 
             return None
         except Exception as e:
             logger.error(f"扫描mitmproxy进程失败: {e}")
             return None
 
+    def _iter_mitm_process_lines(self):
+        """逐个产出命令行包含mitm的进程命令行
+
+        Linux下直接读取/proc/<pid>/cmdline，不再启动ps和grep子进程；
+        其他平台优先使用psutil，不可用时回退到ps命令。
+        """
+        if os.path.isdir('/proc'):
+            for entry in os.scandir('/proc'):
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    with open(f'/proc/{entry.name}/cmdline', 'rb') as f:
+                        cmdline = f.read()
+                except OSError:
+                    # 进程已退出或无权限读取
+                    continue
+                if b'mitm' in cmdline:
+                    yield cmdline.replace(b'\x00', b' ').decode('utf-8', errors='replace').strip()
+            return
+
+        if psutil is not None:
+            for proc in psutil.process_iter(['cmdline']):
+                argv = proc.info.get('cmdline') or []
+                if any('mitm' in arg for arg in argv):
+                    yield ' '.join(argv)
+            return
+
+        result = subprocess.run(
+            ['ps', '-ef'],
+            capture_output=True,
+            text=True,
+            timeout=_PS_TIMEOUT
+        )
+
+        if result.returncode != 0:
+            return
+
+        # 直接在Python中按子串过滤，不再把整个输出再管道给grep
+        for line in result.stdout.splitlines():
+            if 'mitm' in line and 'grep' not in line:
+                yield line.strip()
+
     def _parse_mitm_args(self, process_line: str) -> Tuple[Optional[str], Optional[int]]:
         """解析mitmproxy进程的监听参数"""
         try:
-            host = None
-            web_port = None
-
-            # 1. 匹配 --listen-host 参数
-            host_match = re.search(r'--listen-host[=\s]+(\S+)', process_line)
-            if host_match:
-                host = host_match.group(1)
-
-            # 2. 匹配 --set web_host=主机 参数（mitmweb特有）
-            if not host:
-                web_host_match = re.search(r'--set\s+web_host[=:](\S+)', process_line)
-                if web_host_match:
-                    host = web_host_match.group(1)
-
-            # 3. 匹配 --set web_port=端口 参数（mitmweb的管理端口）
-            web_port_match = re.search(r'--set\s+web_port[=:](\d+)', process_line)
-            if web_port_match:
-                web_port = int(web_port_match.group(1))
-
-            # 4. 匹配 --listen-port 参数（代理端口，作为备选）
-            if not web_port:
-                port_match = re.search(r'--listen-port[=\s]+(\d+)', process_line)
-                if port_match:
-                    web_port = int(port_match.group(1))
-
-            # 5. 匹配 -p 端口参数
-            if not web_port:
-                p_match = re.search(r'-p\s+(\d+)', process_line)
-                if p_match:
-                    web_port = int(p_match.group(1))
-
-            # 6. 如果找到了端口但没有主机，使用默认主机
+            # 1. 单次扫描，记录每个参数首次出现的值
+            found = {}
+            for match in _RE_MITM_ARGS.finditer(process_line):
+                found.setdefault(match.lastgroup, match.group(match.lastgroup))
+
+            # 2. 主机优先级：--listen-host > --set web_host
+            host = found.get('lh') or found.get('wh')
+
+            # 3. 端口优先级：--set web_port > --listen-port > -p
+            port_value = found.get('wp') or found.get('lp') or found.get('p')
+            web_port = int(port_value) if port_value else None
+
+            # 4. 如果找到了端口但没有主机，使用默认主机
             if web_port and not host:
                 host = "127.0.0.1"
 
-            # 7. 记录解析结果用于调试
+            # 5. 记录解析结果用于调试
             if host and web_port:
                 logger.debug(f"成功解析参数: host={host}, web_port={web_port}")
                 return host, web_port
@@ -175,88 +375,96 @@ class DynamicConfig:
 
     def _scan_common_endpoints(self) -> Optional[Tuple[str, int]]:
         """扫描常用的mitmproxy主机和端口组合"""
-        # 常用主机地址（按优先级排序）
-        common_hosts = [
-            "127.0.0.1",     # 最常用的本地地址
-            "localhost",     # 本地地址别名
-            "10.10.12.249",  # 从当前进程发现的地址
-            "10.10.11.28",   # 用户提到的实际地址
-            "0.0.0.0",       # 监听所有接口
-            "10.10.10.146"   # 配置文件中的地址
-        ]
-
-        # 常用端口（按使用频率排序，优先mitmweb管理端口）
-        common_ports = [8082, 8080, 8081, 9999, 9090, 8888, 3128]
-
-        logger.info(f"🔍 扫描 {len(common_hosts)} 个主机地址和 {len(common_ports)} 个端口...")
-
-        # 优化：先测试最可能的组合（优先mitmweb管理端口）
-        priority_combinations = [
-            ("10.10.12.249", 8082),  # 当前发现的mitmweb管理端口
-            ("127.0.0.1", 8082),     # 本地mitmweb管理端口
-            ("localhost", 8082),     # 本地别名
-            ("10.10.12.249", 9999),  # 代理端口作为备选
-        ]
+        logger.info(f"🔍 扫描 {len(_COMMON_HOSTS)} 个主机地址和 {len(_COMMON_PORTS)} 个端口...")
 
         logger.debug("🚀 优先测试常见组合...")
-        for host, port in priority_combinations:
-            if self._test_mitmproxy_connection(host, port):
-                logger.info(f"✅ 优先扫描命中: {host}:{port}")
-                return host, port
+        hit = self._probe_concurrently(_PRIORITY_COMBOS)
+        if hit:
+            logger.info(f"✅ 优先扫描命中: {hit[0]}:{hit[1]}")
+            return hit
 
         # 如果优先组合都失败，再进行全面扫描
         logger.debug("🔍 进行全面端口扫描...")
-        for host in common_hosts:
-            for port in common_ports:
-                # 跳过已经测试过的组合
-                if (host, port) not in priority_combinations:
-                    if self._test_mitmproxy_connection(host, port):
-                        return host, port
+        return self._probe_concurrently(_REMAINING_COMBOS)
 
-        return None
+    def _probe_concurrently(self, combinations: Sequence[Tuple[str, int]]) -> Optional[Tuple[str, int]]:
+        """并发探测多个主机端口组合，按列表优先级返回第一个可用的组合
 
-    def _test_mitmproxy_connection(self, host: str, port: int) -> bool:
-        """测试mitmproxy连接是否可用"""
+        分两阶段：先用廉价的TCP连接排除不可达的组合，再只对存活的组合做HTTP验证。
+        探测以网络等待为主，线程并发后总耗时由超时之和降为单次超时。
+        """
+        if not combinations:
+            return None
+
+        # 阶段1：TCP存活检测（单线程非阻塞连接 + select多路复用）
+        alive_set = self._batch_tcp_alive(combinations)
+        alive = [combo for combo in combinations if combo in alive_set]
+        logger.debug(f"TCP存活检测: {len(alive)}/{len(combinations)} 个端点可连接")
+
+        if not alive:
+            return None
+
+        # 阶段2：仅对存活端点做HTTP验证
+        executor = ThreadPoolExecutor(max_workers=min(SCAN_MAX_WORKERS, len(alive)))
         try:
-            # 1. 快速TCP连接测试
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex((host, port))
-            sock.close()
+            futures = [
+                executor.submit(_probe, host, port)
+                for host, port in alive
+            ]
+            # 按优先级顺序取结果，保证命中结果与串行扫描一致
+            for combination, future in zip(alive, futures):
+                if future.result():
+                    return combination
+            return None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            if result != 0:
-                return False
+    def _batch_tcp_alive(self, targets: Sequence[Tuple[str, int]],
+                         timeout: float = _CONNECT_TIMEOUT) -> Set[Tuple[str, int]]:
+        """批量检测端点是否接受TCP连接（不做HTTP验证）
 
-            # 2. 测试mitmweb的API接口（使用轻量级接口）
-            try:
-                # 先尝试访问根路径，通常更轻量
-                test_url = f"http://{host}:{port}/"
-                response = requests.get(test_url, timeout=2)
-
-                # 检查是否是mitmweb（通过响应头或内容特征）
-                if response.status_code == 200:
-                    # 检查响应头中的Server字段
-                    server_header = response.headers.get('Server', '').lower()
-                    if 'mitmproxy' in server_header:
-                        logger.debug(f"✅ mitmweb验证成功: {host}:{port} (Server: {server_header})")
-                        return True
-
-                    # 检查响应内容是否包含mitmproxy特征
-                    content = response.text[:1000]  # 只检查前1000字符
-                    if any(keyword in content.lower() for keyword in ['mitmproxy', 'mitmweb']):
-                        logger.debug(f"✅ mitmweb验证成功: {host}:{port} (内容特征匹配)")
-                        return True
-
-                logger.debug(f"❌ 不是mitmweb服务: {host}:{port} -> {response.status_code}")
-                return False
-
-            except requests.exceptions.RequestException as e:
-                logger.debug(f"❌ HTTP请求失败: {host}:{port} -> {e}")
-                return False
+        所有连接以非阻塞方式同时发起，再用select等待，整批耗时约为一次连接超时。
+        """
+        pending = {}
+        alive = set()
+        try:
+            for host, port in targets:
+                try:
+                    addr = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                except OSError:
+                    continue
+                sock.setblocking(False)
+                err = sock.connect_ex(addr)
+                if err == 0:
+                    alive.add((host, port))
+                    sock.close()
+                elif err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                    pending[sock] = (host, port)
+                else:
+                    sock.close()
+
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _, writable, _ = select.select([], list(pending), [], remaining)
+                for sock in writable:
+                    target = pending.pop(sock)
+                    # 可写表示连接已完成，SO_ERROR为0才是连接成功（被拒绝时同样可写）
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        alive.add(target)
+                    sock.close()
+        finally:
+            for sock in pending:
+                sock.close()
+
+        return alive
 
-        except Exception as e:
-            logger.debug(f"连接测试失败 {host}:{port}: {e}")
-            return False
+    def _test_mitmproxy_connection(self, host: str, port: int) -> bool:
+        """测试mitmproxy连接是否可用（每次都实际探测，不使用缓存）"""
+        return _check_mitmweb(host, port)
 
     def get_mitm_host(self, override_value: Optional[str] = None) -> str:
         """获取mitm主机地址
@@ -275,7 +483,7 @@ class DynamicConfig:
             return env_host
 
         # 3. 动态发现
-        if not self._discovered_host:
+        if not self._discovered_host and self._should_discover():
             self.discover_running_mitmproxy()  # 实时发现
 
         if self._discovered_host:
@@ -314,7 +522,7 @@ class DynamicConfig:
                 logger.warning(f"环境变量MITM_PORT无效: {env_port}")
 
         # 3. 动态发现
-        if not self._discovered_port:
+        if not self._discovered_port and self._should_discover():
             self.discover_running_mitmproxy()  # 实时发现
 
         if self._discovered_port:
@@ -332,34 +540,44 @@ class DynamicConfig:
         logger.warning(f"使用默认mitm_port: {default_port}")
         return default_port
 
+    def _should_discover(self) -> bool:
+        """尚未尝试过发现，或上次失败已超过重试间隔时返回True"""
+        if self._discovery_attempted_at is None:
+            return True
+        return time.monotonic() - self._discovery_attempted_at >= _DISCOVERY_RETRY_INTERVAL
+
     def _get_config_value(self, key_path: str) -> Any:
         """从配置数据中获取嵌套键值"""
-        try:
-            keys = key_path.split('.')
-            value = self.config_data
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
-            return None
+        return self._flat.get(key_path)
 
     def refresh_discovery(self):
         """刷新动态发现缓存"""
         logger.info("🔄 刷新mitmproxy动态发现...")
         self._discovered_host = None
         self._discovered_port = None
-        self.discover_running_mitmproxy()
+        self._discovery_attempted_at = None
+        self.discover_running_mitmproxy(use_cache=False)
 
     def get_discovery_status(self) -> Dict[str, Any]:
-        """获取发现状态信息"""
+        """获取发现状态信息
+
+        只读取已有状态，不会触发动态发现（不启动进程扫描、不建立连接）。
+        当前取值按与get_mitm_host/get_mitm_port相同的优先级解析。
+        """
+        env_host = os.getenv('MITM_HOST')
+        env_port = os.getenv('MITM_PORT')
+        env_port_value = int(env_port) if env_port and env_port.isdigit() else None
+
         return {
             "discovered_host": self._discovered_host,
             "discovered_port": self._discovered_port,
             "discovery_successful": self._discovered_host is not None and self._discovered_port is not None,
-            "current_mitm_host": self.get_mitm_host(),
-            "current_mitm_port": self.get_mitm_port(),
-            "env_mitm_host": os.getenv('MITM_HOST'),
-            "env_mitm_port": os.getenv('MITM_PORT'),
+            "current_mitm_host": (env_host or self._discovered_host
+                                  or self._flat.get('pipeline.default_mitm_host') or "127.0.0.1"),
+            "current_mitm_port": (env_port_value or self._discovered_port
+                                  or self._flat.get('pipeline.default_mitm_port') or 8080),
+            "env_mitm_host": env_host,
+            "env_mitm_port": env_port,
             "config_loaded": len(self.config_data) > 0
         }
 
@@ -370,8 +588,17 @@ class DynamicConfig:
         return self._test_mitmproxy_connection(host, port)
 
 
-# 全局实例
-dynamic_config = DynamicConfig()
+@lru_cache(maxsize=1)
+def get_dynamic_config() -> DynamicConfig:
+    """获取全局动态配置实例（首次调用时才读取配置文件）"""
+    return DynamicConfig()
+
+
+def __getattr__(name: str):
+    """兼容旧的 `from dynamic_config import dynamic_config` 用法，按需创建全局实例"""
+    if name == 'dynamic_config':
+        return get_dynamic_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # 测试脚本
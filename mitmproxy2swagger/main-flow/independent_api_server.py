@@ -22,22 +22,39 @@ API端点：
 """
 
 import os
+import copy
 import json
 import asyncio
-import uuid
+import itertools
+import secrets
 import time
 import shutil
 import socket
-import subprocess
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import sys
+import stat
+import zlib
+import dataclasses
+import threading
+try:
+    import fcntl  # 用于多worker时的状态文件锁和备份时的FICLONE克隆，Windows下不可用
+except ImportError:
+    fcntl = None
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import formatdate
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import logging
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Request, Response, Depends
 from http import HTTPStatus
 from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel, Field
 try:
     # Pydantic v2
@@ -46,9 +63,33 @@ except Exception:  # pragma: no cover
     RootModel = None  # type: ignore
 import uvicorn
 
+# orjson为可选依赖：可用时用于响应序列化和读取provider文件，否则使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson为可选依赖：无orjson时用于流式读取大型provider文件，避免整份文本与对象同时驻留内存
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# brotli-asgi为可选依赖：可用时按Accept-Encoding优先使用br压缩，否则只用gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# psutil为可选依赖：可用时直接读取网卡地址获取本机IP，否则回退到解析主机名
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 # 导入主流程相关模块
 from integrated_main_pipeline import IntegratedMainPipeline
-from dynamic_config import dynamic_config
+from dynamic_config import get_dynamic_config
 from pathlib import Path
 from collections import OrderedDict
 from urllib.parse import urlparse
@@ -91,13 +132,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# 获取真实的mitm配置用于API文档显示
+# 获取真实的mitm配置用于API文档显示（结果在进程内缓存）
+@lru_cache(maxsize=1)
 def get_real_mitm_config():
     """获取真实的mitm配置，用于API文档默认值"""
     try:
-        dynamic_config.discover_running_mitmproxy()
-        real_host = dynamic_config.get_mitm_host()
-        real_port = dynamic_config.get_mitm_port()
+        get_dynamic_config().discover_running_mitmproxy()
+        real_host = get_dynamic_config().get_mitm_host()
+        real_port = get_dynamic_config().get_mitm_port()
         return real_host, real_port
     except Exception:
         return "127.0.0.1", 8080  # fallback默认值
@@ -107,6 +149,8 @@ REAL_MITM_HOST, REAL_MITM_PORT = get_real_mitm_config()
 
 # Pydantic模型
 class TriggerRequest(BaseModel):
+    # 默认值取自模块加载时发现的真实mitm配置；实际执行时/trigger会重新发现，
+    # 因此不在每次实例化时重复发现
     mitm_host: Optional[str] = Field(
         default=REAL_MITM_HOST,
         description="mitmproxy主机地址（自动发现的真实地址）",
@@ -123,31 +167,11 @@ class TriggerRequest(BaseModel):
         example="data"
     )
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        # 自动发现并填充真实的mitm配置
-        try:
-            dynamic_config.discover_running_mitmproxy()
-            self.mitm_host = dynamic_config.get_mitm_host()
-            self.mitm_port = dynamic_config.get_mitm_port()
-            logger.info(f"🔄 自动填充真实mitm配置: {self.mitm_host}:{self.mitm_port}")
-        except Exception as e:
-            logger.warning(f"⚠️  无法自动填充mitm配置: {e}")
-            # 保持原有值
-
 
 class OfflineTriggerRequest(BaseModel):
     input_file: str  # 必需：离线模式下的输入文件路径
     output_dir: Optional[str] = "data"
 
-    def __init__(self, **data):
-        # 如果没有提供mitm配置，在运行时使用动态配置
-        if 'mitm_host' not in data or data['mitm_host'] is None:
-            data['mitm_host'] = dynamic_config.get_mitm_host()
-        if 'mitm_port' not in data or data['mitm_port'] is None:
-            data['mitm_port'] = dynamic_config.get_mitm_port()
-        super().__init__(**data)
-
 class StatusResponse(BaseModel):
     success: bool
     data: Dict[str, Any]
@@ -159,32 +183,380 @@ class APIResponse(BaseModel):
     data: Dict[str, Any] = {}
 
 
+def _load_json_file(path: str) -> Any:
+    """读取JSON文件；orjson可用时直接解析原始字节，省去UTF-8解码
+
+    不使用mmap：provider文件可能被主流程原地截断重写，映射区域被截断时访问会触发SIGBUS，
+    而整体读取最多得到不完整内容、抛出解析错误。
+    """
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _dump_json_file(path: str, data: Any, indent: bool = True, fsync: bool = False) -> None:
+    """写入JSON文件（保留中文原文），indent为False时写入紧凑格式；orjson可用时直接写入序列化后的字节
+
+    fsync为True时在关闭前把数据刷到磁盘。
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=option))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        if indent:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        else:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _replace_json_file(path: str, data: Any) -> None:
+    """原子地写入JSON文件：先写临时文件并fsync，再用os.replace替换，崩溃时不会留下写了一半的文件"""
+    tmp_path = path + ".tmp"
+    try:
+        _dump_json_file(tmp_path, data, fsync=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # 写入或替换失败时清理临时文件，原文件保持不变
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Linux的FICLONE ioctl：在Btrfs/XFS等写时复制文件系统上克隆文件，只复制元数据
+_FICLONE = 0x40049409
+
+
+def _backup_file(src: str, dst: str) -> None:
+    """备份文件：先尝试FICLONE克隆（写时复制，O(1)），不支持时回退到完整复制
+
+    不使用硬链接：provider配置文件也会被其他流程原地改写，硬链接的备份会随之改变。
+    """
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+                fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+            return
+        except OSError:
+            pass
+    # shutil.copyfile在Linux/macOS上会使用sendfile/fcopyfile在内核中复制
+    shutil.copyfile(src, dst)
+
+
+def _load_providers_file(path: str) -> Tuple[Dict[str, Any], Dict[str, Dict], List[Dict]]:
+    """读取provider文件，返回(元数据, providerId->provider索引, provider列表)
+
+    新的索引格式中providers是以providerId为key的对象；旧的数组格式没有索引，返回空字典。
+    orjson可用或没有ijson时整体解析；否则用ijson流式读取，只物化providers中的各个对象。
+    """
+    if orjson is not None or ijson is None:
+        providers_data = _load_json_file(path)
+        providers_section = providers_data.get('providers', {})
+        metadata = providers_data.get('metadata', {})
+        if isinstance(providers_section, dict):
+            return metadata, providers_section, list(providers_section.values())
+        if isinstance(providers_section, list):
+            return metadata, {}, providers_section
+        return metadata, {}, []
+
+    with open(path, 'rb') as f:
+        metadata = next(ijson.items(f, 'metadata', use_float=True), {})
+        f.seek(0)
+        providers_by_id = dict(ijson.kvitems(f, 'providers', use_float=True))
+        if providers_by_id:
+            return metadata, providers_by_id, list(providers_by_id.values())
+        f.seek(0)
+        return metadata, {}, list(ijson.items(f, 'providers.item', use_float=True))
+
+
+class ORJSONResponse(JSONResponse):
+    """使用orjson序列化的JSON响应（允许非字符串键，与标准库json行为一致）"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# API服务器工作进程数；多于1个时状态通过文件在进程间共享
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# 多进程共享状态文件
+SERVER_STATE_FILE = os.path.join("logs", "server_state.json")
+
+
+# 排队或运行中的主流程任务状态：处于这些状态时不能再提交新任务
+PIPELINE_BUSY_STATUSES = ("queued", "running")
+
+
+class PipelineBusyError(Exception):
+    """已有主流程任务在排队或运行，无法占用任务槽"""
+
+
 # 全局状态管理
+@dataclass(frozen=True, slots=True)
+class StateSnapshot:
+    """服务器状态的不可变快照；每次修改都生成新对象，读取方拿到的始终是一致的状态"""
+    status: str = "idle"  # idle, queued, running, completed, error
+    progress: int = 0
+    message: str = "服务器已就绪"
+    current_task_id: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    result_files: Tuple[str, ...] = ()
+    errors: Tuple[str, ...] = ()
+    running_config: Dict[str, Any] = field(default_factory=dict)
+    pipeline_result: Optional[Dict[str, Any]] = None
+    seq: int = 0  # 每次修改递增，用作/status的ETag
+
+
 class ServerState:
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        self.status = "idle"  # idle, running, completed, error
-        self.progress = 0
-        self.message = "服务器已就绪"
-        self.current_task_id = None
-        self.start_time = None
-        self.end_time = None
-        self.result_files = []
-        self.errors = []
-        self.pipeline_result = None
-        self.running_config = {}
+    """服务器运行状态
+
+    状态保存在不可变的StateSnapshot中：写入方通过update()整体替换快照，
+    读取方取一次snapshot引用即可得到一致的视图，不会看到写了一半的状态。
+    指定state_file时（多worker部署），每次更新都写入状态文件，
+    查询前通过refresh()读取其他worker的最新状态。
+    pipeline_result只在执行任务的进程内使用，不参与共享。
+    """
+
+    _SHARED_FIELDS = (
+        "status", "progress", "message", "current_task_id", "start_time",
+        "end_time", "result_files", "errors", "running_config", "seq"
+    )
+    _DATETIME_FIELDS = ("start_time", "end_time")
+    _TUPLE_FIELDS = ("result_files", "errors")
+
+    def __init__(self, state_file: Optional[str] = None):
+        self._state_file = state_file
+        self._lock = threading.Lock()
+        self.snapshot = StateSnapshot()
+        if self._state_file:
+            # 只在状态文件不存在时初始化：多个worker（包括被uvicorn重启的worker）启动时
+            # 不能用空闲状态覆盖其他worker正在写入的状态
+            with self._locked():
+                if not self._load_shared():
+                    self._save(self.snapshot)
+
+    @contextmanager
+    def _locked(self):
+        """持有线程锁；共享状态文件模式下同时持有跨进程的文件锁"""
+        with self._lock:
+            if not self._state_file:
+                yield
+                return
+            try:
+                lock_file = open(self._state_file + ".lock", "a")
+            except OSError as e:
+                logger.warning("打开共享状态锁文件失败: %s", e)
+                yield
+                return
+            with lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def update(self, **changes) -> StateSnapshot:
+        """原子地替换状态快照并递增seq，返回新快照
+
+        共享状态文件模式下在文件锁内先读取其他worker的最新状态再递增seq，seq在所有worker间单调递增。
+        """
+        with self._locked():
+            if self._state_file:
+                self._load_shared()
+            snapshot = dataclasses.replace(self.snapshot, seq=self.snapshot.seq + 1, **changes)
+            self.snapshot = snapshot
+            if self._state_file:
+                self._save(snapshot)
+        return snapshot
+
+    def reset(self) -> StateSnapshot:
+        """恢复初始状态（seq继续递增，已缓存的ETag随之失效）"""
+        with self._locked():
+            if self._state_file:
+                self._load_shared()
+            snapshot = StateSnapshot(seq=self.snapshot.seq + 1)
+            self.snapshot = snapshot
+            if self._state_file:
+                self._save(snapshot)
+        return snapshot
+
+    def claim(self, task_id: str, config: Dict[str, Any]) -> StateSnapshot:
+        """原子地占用主流程任务槽：状态为排队或运行中时抛出PipelineBusyError，否则置为queued
+
+        检查与写入在同一把（跨进程）锁内完成，多worker同时提交时只有一个能成功。
+        """
+        with self._locked():
+            if self._state_file:
+                self._load_shared()
+            if self.snapshot.status in PIPELINE_BUSY_STATUSES:
+                raise PipelineBusyError(self.snapshot.current_task_id)
+            snapshot = dataclasses.replace(
+                self.snapshot,
+                seq=self.snapshot.seq + 1,
+                status="queued",
+                progress=0,
+                message="任务已排队，等待执行...",
+                current_task_id=task_id,
+                start_time=None,
+                end_time=None,
+                running_config=config,
+                result_files=(),
+                errors=(),
+                pipeline_result=None
+            )
+            self.snapshot = snapshot
+            if self._state_file:
+                self._save(snapshot)
+        return snapshot
+
+    def release(self, task_id: str) -> None:
+        """释放claim()占用但未能入队的任务槽（任务槽已被其他任务使用时不做修改）"""
+        with self._locked():
+            if self._state_file:
+                self._load_shared()
+            if self.snapshot.status != "queued" or self.snapshot.current_task_id != task_id:
+                return
+            snapshot = StateSnapshot(seq=self.snapshot.seq + 1)
+            self.snapshot = snapshot
+            if self._state_file:
+                self._save(snapshot)
+
+    def refresh(self) -> StateSnapshot:
+        """从共享状态文件读取最新状态（单进程模式下直接返回当前快照）"""
+        if not self._state_file:
+            return self.snapshot
+        with self._lock:
+            self._load_shared()
+            return self.snapshot
+
+    def _load_shared(self) -> bool:
+        """读取共享状态文件并合并到当前快照（调用方持有锁），文件不存在或无法解析时返回False"""
+        try:
+            with open(self._state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        changes = {}
+        for name in self._SHARED_FIELDS:
+            if name not in data:
+                continue
+            value = data[name]
+            if name in self._DATETIME_FIELDS and value:
+                value = datetime.fromisoformat(value)
+            elif name in self._TUPLE_FIELDS:
+                value = tuple(value or ())
+            changes[name] = value
+        self.snapshot = dataclasses.replace(self.snapshot, **changes)
+        return True
+
+    def _save(self, snapshot: StateSnapshot):
+        """把共享字段写入状态文件（调用方持有文件锁）：写临时文件再原子替换"""
+        data = {}
+        for name in self._SHARED_FIELDS:
+            value = getattr(snapshot, name)
+            if name in self._DATETIME_FIELDS and value is not None:
+                value = value.isoformat()
+            data[name] = value
+
+        tmp_path = f"{self._state_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self._state_file)
+        except OSError as e:
+            logger.warning("写入共享状态失败: %s", e)
 
 # 全局状态实例
-server_state = ServerState()
+server_state = ServerState(SERVER_STATE_FILE if API_WORKERS > 1 else None)
+
+# 上传文件分块写入的块大小（1 MiB）
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _remove_upload(path: str) -> None:
+    """删除未能提交任务的上传文件（文件不存在时忽略）"""
+    try:
+        os.remove(path)
+    except OSError as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning("删除上传文件失败: %s (%s)", path, e)
+
+
+def _save_upload(src, dest_path: str) -> int:
+    """把上传文件从临时文件分块复制到目标路径，返回写入的字节数（在线程中调用）"""
+    src.seek(0)
+    try:
+        with open(dest_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+            return dst.tell()
+    except BaseException:
+        # 写入失败时不留下不完整的文件
+        _remove_upload(dest_path)
+        raise
+
+# 执行主流程等阻塞任务的执行器：默认线程池；PIPELINE_EXECUTOR=process 时使用进程池，
+# 主流程中CPU密集的分析不再与事件循环争抢GIL
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "thread").lower()
+if PIPELINE_EXECUTOR == "process":
+    _PIPELINE_POOL = ProcessPoolExecutor(max_workers=2)
+else:
+    _PIPELINE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline")
+
+# 任务ID：进程启动时生成一次随机前缀，之后用递增计数，不必每个任务都读取系统随机源；
+# 多worker部署时各进程前缀不同，ID仍然唯一
+_TASK_ID_PREFIX = secrets.token_hex(4)
+_TASK_COUNTER = itertools.count(1)
+
+
+def _new_task_id() -> str:
+    """生成新的任务ID"""
+    return f"{_TASK_ID_PREFIX}-{next(_TASK_COUNTER):x}"
+
+
+# 主流程任务队列容量：正在执行的任务之外最多排队的任务数
+PIPELINE_QUEUE_SIZE = 1
+
+
+async def _pipeline_worker(queue: asyncio.Queue):
+    """依次取出排队的主流程任务并执行（主流程本身在执行器中运行，不阻塞事件循环）"""
+    while True:
+        task_id, config, offline_mode, input_file = await queue.get()
+        try:
+            await run_pipeline_async(config, offline_mode, input_file, task_id=task_id)
+        except Exception as e:
+            logger.error("主流程任务 %s 执行异常: %s", task_id, e, exc_info=True)
+        finally:
+            queue.task_done()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：创建主流程任务队列并启动后台worker，关闭时取消worker"""
+    app.state.task_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    worker = asyncio.create_task(_pipeline_worker(app.state.task_queue))
+    try:
+        yield
+    finally:
+        worker.cancel()
 
 
 # FastAPI应用
 app = FastAPI(
     title="银行Provider生成API服务",
     description="独立的银行Provider生成服务，从mitmproxy抓包文件生成Reclaim协议标准配置",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -196,18 +568,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 压缩较大的JSON响应（/providers、/files等可达数百KB）
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # 确保必要目录存在
 def ensure_directories():
     """确保必要的目录存在"""
     dirs = ["data", "temp", "uploads"]
     for dir_name in dirs:
         os.makedirs(dir_name, exist_ok=True)
-        logger.info(f"确保目录存在: {dir_name}")
+        logger.debug("确保目录存在: %s", dir_name)
 
 ensure_directories()
 
 
 
+# 没有时间戳或无法解析时的排序键：大于任何真实时间戳，倒序排序时排在最前（视为最新）
+_MISSING_TIMESTAMP_KEY = "9999"
+
+
+@lru_cache(maxsize=4096)
+def _normalize_provider_timestamp(generated_at: str) -> str:
+    """把带时区偏移等非常规格式的时间戳转换为UTC的ISO字符串排序键；解析失败返回缺省键
+
+    同一批生成的provider时间戳大量重复，结果按字符串缓存。
+    """
+    try:
+        dt = datetime.fromisoformat(generated_at.replace('Z', '+00:00'))
+    except (ValueError, TypeError):
+        return _MISSING_TIMESTAMP_KEY
+    # 如果是timezone-aware，转换为UTC
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat()
+
+
+def _provider_sort_key(provider: Dict) -> str:
+    """Provider的排序键：UTC时间的ISO字符串，按字典序比较即按时间先后"""
+    try:
+        # 从metadata中获取生成时间
+        generated_at = provider.get('providerConfig', {}).get('providerConfig', {}).get('metadata', {}).get('generated_at')
+    except AttributeError:
+        return _MISSING_TIMESTAMP_KEY
+    if not generated_at or not isinstance(generated_at, str):
+        return _MISSING_TIMESTAMP_KEY
+    # 常见格式（YYYY-MM-DDTHH:MM:SS，可带Z）直接截取，不做解析
+    if len(generated_at) == 19 or (len(generated_at) == 20 and generated_at[19] == 'Z'):
+        if generated_at[10] == 'T':
+            return generated_at[:19]
+    return _normalize_provider_timestamp(generated_at)
+
+
 def sort_providers_by_time(providers_array: List[Dict], reverse: bool = True) -> List[Dict]:
     """统一的Provider排序函数
 
@@ -218,32 +632,13 @@ def sort_providers_by_time(providers_array: List[Dict], reverse: bool = True) ->
     Returns:
         排序后的Provider数组
     """
-    from datetime import datetime, timezone
-
-    def get_provider_timestamp(provider):
-        try:
-            # 从metadata中获取生成时间
-            generated_at = provider.get('providerConfig', {}).get('providerConfig', {}).get('metadata', {}).get('generated_at', '')
-            if generated_at:
-                # 解析ISO格式时间戳，确保时区一致
-                dt = datetime.fromisoformat(generated_at.replace('Z', '+00:00'))
-                # 如果是timezone-aware，转换为UTC
-                if dt.tzinfo is not None:
-                    return dt.astimezone(timezone.utc).replace(tzinfo=None)
-                return dt
-            else:
-                # 如果没有时间戳，使用当前时间（timezone-naive）
-                return datetime.now()
-        except:
-            # 解析失败时使用当前时间（timezone-naive）
-            return datetime.now()
-
-    # 按时间排序
-    return sorted(providers_array, key=get_provider_timestamp, reverse=reverse)
+    # 按时间排序（比较规范化后的时间字符串）
+    return sorted(providers_array, key=_provider_sort_key, reverse=reverse)
 
 
+@lru_cache(maxsize=1)
 def get_local_ip() -> str:
-    """动态获取本机IP地址"""
+    """动态获取本机IP地址（结果在进程内缓存，避免重复的socket和网卡查询）"""
     try:
         # 方法1: 连接到远程地址获取本地IP
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
@@ -252,34 +647,28 @@ def get_local_ip() -> str:
     except Exception:
         pass
 
-    try:
-        # 方法2: 通过ifconfig获取活跃网络接口的IP
-        result = subprocess.run(
-            ["ifconfig"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            for line in lines:
-                if 'inet ' in line and '127.0.0.1' not in line and 'broadcast' in line:
-                    parts = line.strip().split()
-                    for i, part in enumerate(parts):
-                        if part == "inet" and i + 1 < len(parts):
-                            ip = parts[i + 1]
-                            # 优先返回192.168.x.x或10.x.x.x的内网IP
-                            if ip.startswith(('192.168.', '10.', '172.')):
-                                return ip
-    except Exception:
-        pass
+    # 方法2: 读取网卡地址（psutil）或解析主机名，不再启动ifconfig子进程
+    candidates: List[str] = []
+    if psutil is not None:
+        try:
+            for addrs in psutil.net_if_addrs().values():
+                candidates.extend(a.address for a in addrs if a.family == socket.AF_INET)
+        except Exception:
+            pass
+    if not candidates:
+        try:
+            infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+            candidates = [info[4][0] for info in infos]
+        except Exception:
+            pass
 
-    try:
-        # 方法3: 通过hostname获取
-        hostname = socket.gethostname()
-        return socket.gethostbyname(hostname)
-    except Exception:
-        pass
+    # 优先返回192.168.x.x、10.x.x.x或172.x.x.x的内网IP，其次是任意非回环地址
+    candidates = [ip for ip in candidates if not ip.startswith("127.")]
+    for ip in candidates:
+        if ip.startswith(('192.168.', '10.', '172.')):
+            return ip
+    if candidates:
+        return candidates[0]
 
     # 备用方案: 返回localhost
     return "127.0.0.1"
@@ -291,64 +680,117 @@ def get_local_ip() -> str:
 
 DOMAIN_HOMEPAGES_FILE = os.path.join("data", "domain_homepages.json")
 
+# 域名映射的内存缓存：以文件修改时间(st_mtime_ns)为版本，文件不存在时为None；
+# index为由data派生的查找索引，随data一起更新
+_HOMEPAGES_CACHE: Dict[str, Any] = {"mtime": None, "data": {}, "index": ({}, {})}
+_HOMEPAGES_LOCK = threading.RLock()
 
-def _load_domain_homepages() -> Dict[str, str]:
+
+def _domain_homepages_mtime() -> Optional[int]:
+    """域名映射文件的修改时间（纳秒），文件不存在时为None"""
     try:
-        if os.path.exists(DOMAIN_HOMEPAGES_FILE):
-            with open(DOMAIN_HOMEPAGES_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
+        return os.stat(DOMAIN_HOMEPAGES_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_domain_homepages() -> Dict[str, str]:
+    """读取域名映射；文件未变化时直接返回缓存
+
+    返回的字典为缓存共享对象，调用方需要修改时先复制。
+    """
+    return _load_domain_homepages_at(_domain_homepages_mtime())
+
+
+def _load_domain_homepages_at(mtime: Optional[int]) -> Dict[str, str]:
+    """按调用方已取得的文件修改时间读取域名映射，避免重复stat"""
+    with _HOMEPAGES_LOCK:
+        if mtime == _HOMEPAGES_CACHE["mtime"]:
+            return _HOMEPAGES_CACHE["data"]
+        mapping: Dict[str, str] = {}
+        if mtime is not None:
+            try:
+                data = _load_json_file(DOMAIN_HOMEPAGES_FILE)
                 # 仅保留str->str
                 if isinstance(data, dict):
-                    return {str(k): str(v) for k, v in data.items()}
-        return {}
-    except Exception as e:
-        logger.warning(f"读取域名首页配置失败: {e}")
-        return {}
+                    mapping = {str(k): str(v) for k, v in data.items()}
+            except Exception as e:
+                logger.warning("读取域名首页配置失败: %s", e)
+                return {}
+        _HOMEPAGES_CACHE["mtime"] = mtime
+        _HOMEPAGES_CACHE["data"] = mapping
+        _HOMEPAGES_CACHE["index"] = _build_homepage_index(mapping)
+        return mapping
 
 
 def _save_domain_homepages(mapping: Dict[str, str]) -> None:
+    """写入域名映射：先写临时文件再原子替换，读取方不会看到写了一半的文件"""
     os.makedirs(os.path.dirname(DOMAIN_HOMEPAGES_FILE), exist_ok=True)
-    with open(DOMAIN_HOMEPAGES_FILE, "w", encoding="utf-8") as f:
-        json.dump(mapping, f, ensure_ascii=False, indent=2)
+    tmp_path = f"{DOMAIN_HOMEPAGES_FILE}.{os.getpid()}.tmp"
+    with _HOMEPAGES_LOCK:
+        # 该文件只由程序读取，写入紧凑格式；需要查看时使用 GET /domain-homepages?pretty=1
+        _dump_json_file(tmp_path, mapping, indent=False)
+        os.replace(tmp_path, DOMAIN_HOMEPAGES_FILE)
+        # 直接更新缓存，避免下次读取时重新解析刚写入的文件
+        _HOMEPAGES_CACHE["mtime"] = os.stat(DOMAIN_HOMEPAGES_FILE).st_mtime_ns
+        _HOMEPAGES_CACHE["data"] = dict(mapping)
+        _HOMEPAGES_CACHE["index"] = _build_homepage_index(mapping)
+
+
+def _build_homepage_index(mapping: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """构建域名查找索引：(规范化域名->首页 的精确匹配表, 按反转标签组织的后缀树)
+
+    后缀树形如 {"com": {"example": {"$": "https://..."}}}，域名只在构建时规范化一次。
+    同一规范化域名出现多次时保留先出现的配置。
+    """
+    exact: Dict[str, str] = {}
+    trie: Dict[str, Any] = {}
+    for domain, homepage in mapping.items():
+        d = (domain or "").lower().strip()
+        if not d:
+            continue
+        exact.setdefault(d, homepage)
+        node = trie
+        for label in reversed(d.split(".")):
+            node = node.setdefault(label, {})
+        node.setdefault("$", homepage)
+    return exact, trie
 
 
 def _extract_login_url_from_provider(provider: Dict[str, Any]) -> Optional[str]:
-    try:
-        if not isinstance(provider, dict):
-            return None
-        # 常见路径优先：provider.providerConfig.providerConfig.loginUrl
-        pc = provider.get("providerConfig")
-        if isinstance(pc, dict):
-            inner = pc.get("providerConfig")
-            if isinstance(inner, dict) and isinstance(inner.get("loginUrl"), str):
-                return inner.get("loginUrl")
-            if isinstance(pc.get("loginUrl"), str):
-                return pc.get("loginUrl")
-        if isinstance(provider.get("loginUrl"), str):
-            return provider.get("loginUrl")
-    except Exception:
+    # 只有dict访问和isinstance判断，不会抛出异常，无需try/except
+    if not isinstance(provider, dict):
         return None
-    return None
+    # 常见路径优先：provider.providerConfig.providerConfig.loginUrl
+    pc = provider.get("providerConfig")
+    if isinstance(pc, dict):
+        inner = pc.get("providerConfig")
+        if isinstance(inner, dict):
+            url = inner.get("loginUrl")
+            if isinstance(url, str):
+                return url
+        url = pc.get("loginUrl")
+        if isinstance(url, str):
+            return url
+    url = provider.get("loginUrl")
+    return url if isinstance(url, str) else None
 
 
 def _set_login_url_in_provider(provider: Dict[str, Any], new_url: str) -> bool:
-    try:
-        if not isinstance(provider, dict):
-            return False
-        pc = provider.get("providerConfig")
-        if isinstance(pc, dict):
-            inner = pc.get("providerConfig")
-            if isinstance(inner, dict):
-                inner["loginUrl"] = new_url
-                return True
-            # 退化路径
-            pc["loginUrl"] = new_url
+    if not isinstance(provider, dict):
+        return False
+    pc = provider.get("providerConfig")
+    if isinstance(pc, dict):
+        inner = pc.get("providerConfig")
+        if isinstance(inner, dict):
+            inner["loginUrl"] = new_url
             return True
-        # 根层兜底
-        provider["loginUrl"] = new_url
+        # 退化路径
+        pc["loginUrl"] = new_url
         return True
-    except Exception:
-        return False
+    # 根层兜底
+    provider["loginUrl"] = new_url
+    return True
 
 
 def _get_homepage_for_url(url: str, mapping: Dict[str, str]) -> Optional[str]:
@@ -359,17 +801,23 @@ def _get_homepage_for_url(url: str, mapping: Dict[str, str]) -> Optional[str]:
         host = (parsed.hostname or "").lower()
         if not host:
             return None
+        # 缓存中的映射直接使用预构建的索引，其他映射临时构建
+        if mapping is _HOMEPAGES_CACHE["data"]:
+            exact, trie = _HOMEPAGES_CACHE["index"]
+        else:
+            exact, trie = _build_homepage_index(mapping)
         # 优先精确匹配
-        if host in mapping:
-            return mapping[host]
-        # 子域匹配：host 以 .domain 结尾
-        for domain, homepage in mapping.items():
-            d = (domain or "").lower().strip()
-            if not d:
-                continue
-            if host == d or host.endswith("." + d):
-                return homepage
-        return None
+        if host in exact:
+            return exact[host]
+        # 子域匹配：沿反转标签遍历后缀树，取最深（最具体）的命中
+        homepage = None
+        node = trie
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            homepage = node.get("$", homepage)
+        return homepage
     except Exception:
         return None
 
@@ -405,14 +853,20 @@ else:
 
 
 @app.get("/domain-homepages", response_model=APIResponse)
-async def get_domain_homepages():
-    """获取所有 域名→首页链接 配置"""
+async def get_domain_homepages(pretty: bool = False):
+    """获取所有 域名→首页链接 配置；pretty=1 时返回缩进格式便于人工查看"""
     mapping = _load_domain_homepages()
-    return APIResponse(
+    result = APIResponse(
         success=True,
         message="查询成功",
         data={"mappings": mapping, "count": len(mapping)}
     )
+    if pretty:
+        return Response(
+            content=json.dumps(result.model_dump(), ensure_ascii=False, indent=2),
+            media_type="application/json"
+        )
+    return result
 
 
 @app.get("/domain-homepages/{domain}", response_model=APIResponse)
@@ -427,7 +881,7 @@ async def get_domain_homepage(domain: str):
 async def upsert_domain_homepage(payload: DomainHomepagePayload):
     """新增或更新一对域名→首页链接（请求体为单对映射）"""
     domain, homepage = payload.get_single_pair()
-    mapping = _load_domain_homepages()
+    mapping = dict(_load_domain_homepages())
     mapping[domain] = homepage
     _save_domain_homepages(mapping)
     return APIResponse(success=True, message="保存成功", data={"domain": domain, "homepage": homepage, "mappings": mapping})
@@ -435,7 +889,7 @@ async def upsert_domain_homepage(payload: DomainHomepagePayload):
 
 @app.delete("/domain-homepages/{domain}", response_model=APIResponse)
 async def delete_domain_homepage(domain: str):
-    mapping = _load_domain_homepages()
+    mapping = dict(_load_domain_homepages())
     if domain in mapping:
         mapping.pop(domain)
         _save_domain_homepages(mapping)
@@ -443,54 +897,114 @@ async def delete_domain_homepage(domain: str):
     raise HTTPException(status_code=404, detail="未找到该域名的配置")
 
 
+# 内置页面：启动时读取一次并以字节形式保存在内存中，请求时不再访问磁盘（修改页面后需重启服务）
+WEB_EXTENSION_PATH = Path(__file__).resolve().parent / "web_extension.html"
+
+
+def _read_web_extension_html() -> Optional[bytes]:
+    """读取内置页面的字节内容；文件不存在或无法读取时返回None"""
+    try:
+        return WEB_EXTENSION_PATH.read_bytes()
+    except OSError as e:
+        logger.warning("读取内置页面失败: %s", e)
+        return None
+
+
+_WEB_EXTENSION_BYTES = _read_web_extension_html()
+
+
 @app.get("/ui/domain-homepages", response_class=HTMLResponse)
 async def ui_domain_homepages():
     """简单内置页面：加载 main-flow/web_extension.html（含域名配置管理UI）"""
+    if _WEB_EXTENSION_BYTES is None:
+        return HTMLResponse("<h3>未找到内置页面</h3>", status_code=404)
+    return Response(content=_WEB_EXTENSION_BYTES, media_type="text/html; charset=utf-8")
+
+
+# 主流程输出的结果文件名前缀
+_RESULT_PREFIXES = ('reclaim_providers_', 'questionable_apis_', 'feature_analysis_', 'integrated_pipeline_report_')
+
+
+def _collect_result_files(output_files: Any, data_dir: str) -> List[str]:
+    """收集主流程生成的结果文件列表（阻塞的文件系统操作）"""
+    result_files = []
+    # 用集合去重，避免每个候选文件都线性扫描列表；按绝对路径比较，
+    # output_files中的绝对路径与目录扫描得到的相对路径指向同一文件时只记录一次
+    seen = set()
+
+    # 从集成主流程的output_files结构获取文件列表
+    if isinstance(output_files, dict):
+        for file_path in output_files.values():
+            if not file_path:
+                continue
+            key = os.path.abspath(file_path)
+            if key not in seen and os.path.exists(file_path):
+                seen.add(key)
+                result_files.append(file_path)
+
+    # 检查data目录中的相关文件：一次scandir，is_file使用目录项自带的类型信息，不额外stat
     try:
-        current_dir = Path(__file__).resolve().parent
-        html_path = current_dir / "web_extension.html"
-        if not html_path.exists():
-            return HTMLResponse("<h3>未找到内置页面</h3>", status_code=404)
-        content = html_path.read_text(encoding="utf-8")
-        return HTMLResponse(content)
-    except Exception as e:
-        logger.error(f"加载内置页面失败: {e}")
-        return HTMLResponse(f"<h3>加载失败: {e}</h3>", status_code=500)
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                if (entry.name.endswith('.json') and entry.name.startswith(_RESULT_PREFIXES)
+                        and entry.is_file(follow_symlinks=False)):
+                    key = os.path.abspath(entry.path)
+                    if key not in seen:
+                        seen.add(key)
+                        result_files.append(entry.path)
+    except FileNotFoundError:
+        pass
 
+    return result_files
 
-async def run_pipeline_async(config: Dict[str, Any], offline_mode: bool = False, input_file: str = None):
-    """异步运行主流程"""
-    global server_state
 
-    task_id = str(uuid.uuid4())
-    server_state.current_task_id = task_id
-    server_state.status = "running"
-    server_state.progress = 0
-    server_state.message = "正在初始化主流程..."
-    server_state.start_time = datetime.now()
-    server_state.running_config = config
-    server_state.errors = []
+def _run_full_pipeline(config: Dict[str, Any], offline_mode: bool, input_file: Optional[str]) -> Dict[str, Any]:
+    """创建集成主流程实例并执行；定义在模块级，以便进程池执行器可以序列化调用"""
+    pipeline = IntegratedMainPipeline(config)
+    return pipeline.run_full_pipeline(
+        offline_mode=offline_mode,
+        input_file=input_file
+    )
+
+
+async def run_pipeline_async(config: Dict[str, Any], offline_mode: bool = False, input_file: str = None,
+                             task_id: Optional[str] = None):
+    """异步运行主流程"""
+    task_id = task_id or _new_task_id()
+    server_state.update(
+        current_task_id=task_id,
+        status="running",
+        progress=0,
+        message="正在初始化主流程...",
+        start_time=datetime.now(),
+        end_time=None,
+        running_config=config,
+        result_files=(),
+        errors=(),
+        pipeline_result=None
+    )
 
-    logger.info(f"开始执行主流程任务: {task_id}")
-    logger.info(f"配置: {config}")
-    logger.info(f"离线模式: {offline_mode}, 输入文件: {input_file}")
+    logger.info("开始执行主流程任务: %s", task_id)
+    logger.info("配置: %s", config)
+    logger.info("离线模式: %s, 输入文件: %s", offline_mode, input_file)
 
+    # 最终状态与end_time一起在finally中一次性写入，查询方不会看到completed但缺少结束时间的状态
+    final_state: Dict[str, Any] = {}
     try:
         # 更新进度：初始化
-        server_state.progress = 10
-        server_state.message = "创建集成主流程管道器..."
-
-        # 创建集成主流程实例
-        pipeline = IntegratedMainPipeline(config)
+        server_state.update(progress=10, message="创建集成主流程管道器...")
 
         # 更新进度：开始执行
-        server_state.progress = 20
-        server_state.message = "开始执行集成主流程..."
-
-        # 执行集成主流程
-        result = pipeline.run_full_pipeline(
-            offline_mode=offline_mode,
-            input_file=input_file
+        server_state.update(progress=20, message="开始执行集成主流程...")
+
+        # 执行集成主流程 - 在执行器中创建并运行，避免阻塞事件循环（执行期间仍可响应/status等请求）
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            _PIPELINE_POOL,
+            _run_full_pipeline,
+            config,
+            offline_mode,
+            input_file
         )
 
         # 检查结果是否有效
@@ -499,8 +1013,14 @@ async def run_pipeline_async(config: Dict[str, Any], offline_mode: bool = False,
 
         # 更新最终状态
         if result.get('success', False):
-            server_state.status = "completed"
-            server_state.progress = 100
+            # 记录输出文件 - 适配集成主流程的结构（目录扫描同样放到线程池中）
+            data_dir = config.get('output_dir', 'data')
+            result_files = await loop.run_in_executor(
+                _PIPELINE_POOL,
+                _collect_result_files,
+                result.get('output_files', {}),
+                data_dir
+            )
 
             # 获取集成主流程的结果
             report = result.get('report', {})
@@ -513,48 +1033,38 @@ async def run_pipeline_async(config: Dict[str, Any], offline_mode: bool = False,
             questionable_count = provider_results.get('questionable_count', 0)
             valuable_apis = analysis_results.get('valuable_apis', 0)
 
-            server_state.message = f"集成主流程执行成功！识别 {valuable_apis} 个有价值API，成功构建 {providers_count} 个Reclaim Provider，{questionable_count} 个存疑API"
-            server_state.pipeline_result = result
-
-            # 记录输出文件 - 适配集成主流程的结构
-            server_state.result_files = []
-
-            # 从集成主流程的output_files结构获取文件列表
-            output_files = result.get('output_files', {})
-            if isinstance(output_files, dict):
-                for file_path in output_files.values():
-                    if file_path and os.path.exists(file_path):
-                        server_state.result_files.append(file_path)
+            final_state = {
+                "status": "completed",
+                "progress": 100,
+                "result_files": tuple(result_files),
+                "message": f"集成主流程执行成功！识别 {valuable_apis} 个有价值API，成功构建 {providers_count} 个Reclaim Provider，{questionable_count} 个存疑API",
+                "pipeline_result": result
+            }
 
-            # 检查data目录中的相关文件
-            data_dir = config.get('output_dir', 'data')
-            if os.path.exists(data_dir):
-                for file in os.listdir(data_dir):
-                    if file.endswith('.json') and any(prefix in file for prefix in
-                        ['reclaim_providers_', 'questionable_apis_', 'feature_analysis_', 'integrated_pipeline_report_']):
-                        file_path = os.path.join(data_dir, file)
-                        if file_path not in server_state.result_files:
-                            server_state.result_files.append(file_path)
-
-            logger.info(f"集成主流程执行成功: {result}")
+            logger.info("集成主流程执行成功: %s", result)
         else:
-            server_state.status = "error"
             error_message = result.get('message', '未知错误') if result else '集成主流程返回空结果'
-            server_state.message = f"集成主流程执行失败: {error_message}"
-            server_state.errors.append(error_message)
-            logger.error(f"集成主流程执行失败: {result}")
+            final_state = {
+                "status": "error",
+                "message": f"集成主流程执行失败: {error_message}",
+                "errors": server_state.snapshot.errors + (error_message,)
+            }
+            logger.error("集成主流程执行失败: %s", result)
 
     except Exception as e:
-        server_state.status = "error"
-        server_state.message = f"集成主流程执行异常: {str(e)}"
-        server_state.errors.append(str(e))
-        logger.error(f"集成主流程执行异常: {e}", exc_info=True)
+        final_state = {
+            "status": "error",
+            "message": f"集成主流程执行异常: {str(e)}",
+            "errors": server_state.snapshot.errors + (str(e),)
+        }
+        logger.error("集成主流程执行异常: %s", e, exc_info=True)
 
     finally:
-        server_state.end_time = datetime.now()
-        if server_state.start_time:
-            duration = server_state.end_time - server_state.start_time
-            logger.info(f"任务 {task_id} 完成，耗时: {duration}")
+        final_state["end_time"] = datetime.now()
+        snapshot = server_state.update(**final_state)
+        if snapshot.start_time:
+            duration = snapshot.end_time - snapshot.start_time
+            logger.info("任务 %s 完成，耗时: %s", task_id, duration)
 
 
 @app.get("/", response_class=JSONResponse)
@@ -588,35 +1098,45 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "server_status": server_state.status
+        "server_status": server_state.snapshot.status
     }
 
 
 @app.get("/status", response_model=StatusResponse)
-async def get_status():
+async def get_status(request: Request, response: Response):
     """获取当前状态"""
-    global server_state
+    # 只读取一次快照引用，后续字段都来自同一个一致的状态
+    snapshot = server_state.refresh()
 
     # 计算运行时间
     duration_seconds = None
-    if server_state.start_time:
-        if server_state.end_time:
-            duration = server_state.end_time - server_state.start_time
+    if snapshot.start_time:
+        if snapshot.end_time:
+            duration = snapshot.end_time - snapshot.start_time
         else:
-            duration = datetime.now() - server_state.start_time
+            duration = datetime.now() - snapshot.start_time
         duration_seconds = int(duration.total_seconds())
 
+    # 条件请求：状态序号未变化时直接返回304；任务运行中耗时每秒变化，一并计入ETag
+    if snapshot.start_time and not snapshot.end_time:
+        etag = f'"{snapshot.seq}-{duration_seconds}"'
+    else:
+        etag = f'"{snapshot.seq}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+
     status_data = {
-        "status": server_state.status,
-        "progress": server_state.progress,
-        "message": server_state.message,
-        "task_id": server_state.current_task_id,
-        "start_time": server_state.start_time.isoformat() if server_state.start_time else None,
-        "end_time": server_state.end_time.isoformat() if server_state.end_time else None,
+        "status": snapshot.status,
+        "progress": snapshot.progress,
+        "message": snapshot.message,
+        "task_id": snapshot.current_task_id,
+        "start_time": snapshot.start_time.isoformat() if snapshot.start_time else None,
+        "end_time": snapshot.end_time.isoformat() if snapshot.end_time else None,
         "duration_seconds": duration_seconds,
-        "result_files_count": len(server_state.result_files),
-        "errors": server_state.errors,
-        "config": server_state.running_config
+        "result_files_count": len(snapshot.result_files),
+        "errors": list(snapshot.errors),
+        "config": snapshot.running_config
     }
 
     return StatusResponse(
@@ -629,57 +1149,102 @@ async def get_status():
 @app.post("/reset")
 async def reset_status():
     """重置服务器状态"""
-    global server_state
-
-    # 如果当前有任务在运行，不允许重置
-    if server_state.status == "running":
+    # 如果当前有任务在排队或运行，不允许重置
+    if server_state.refresh().status in PIPELINE_BUSY_STATUSES:
         raise HTTPException(
             status_code=400,
             detail="当前有任务正在运行，无法重置状态"
         )
 
-    server_state.reset()
+    snapshot = server_state.reset()
+    # 重置时一并丢弃mitm代理发现结果，下一次触发重新发现
+    _discover_mitm_cached.cache_clear()
     logger.info("服务器状态已重置")
 
     return APIResponse(
         success=True,
         message="服务器状态已重置",
-        data={"status": server_state.status}
+        data={"status": snapshot.status}
     )
 
 
-@app.post("/trigger")
-async def trigger_pipeline(request: TriggerRequest):
-    """触发集成主流程（在线模式）- 从mitmproxy导出数据并执行完整流程"""
-    global server_state
+# /trigger中mitm代理发现结果的复用时长（秒）
+MITM_DISCOVERY_TTL = 5
+
+
+@lru_cache(maxsize=1)
+def _discover_mitm_cached(time_bucket: int) -> Tuple[str, int]:
+    """发现运行中的mitm代理；以时间分桶为缓存键，同一时间窗口内只发现一次
+
+    未发现时抛出LookupError，lru_cache不缓存异常，下一次请求会重新发现。
+    """
+    config = get_dynamic_config()
+    host, port = config.discover_running_mitmproxy()
+    if host is None:
+        raise LookupError("未发现运行中的mitm代理")
+    return config.get_mitm_host(), config.get_mitm_port()
+
 
-    # 检查是否有任务正在运行
-    if server_state.status == "running":
+def resolved_mitm_cfg() -> Tuple[str, int]:
+    """FastAPI依赖：返回自动发现的真实mitm代理配置（同步依赖，在线程池中执行发现）"""
+    try:
+        logger.info("🔍 开始自动发现真实运行的mitm代理...")
+        return _discover_mitm_cached(int(time.monotonic()) // MITM_DISCOVERY_TTL)
+    except LookupError:
+        # 未发现时沿用动态配置的默认地址，但不缓存，下一次触发重新发现
+        logger.warning("⚠️ 未发现运行中的mitm代理，使用默认配置")
+        config = get_dynamic_config()
+        return config.get_mitm_host(), config.get_mitm_port()
+    except Exception as e:
+        logger.error("❌ 自动发现失败: %s", e)
+        raise HTTPException(status_code=500, detail=f"无法发现运行中的mitm代理: {str(e)}")
+
+
+def _check_pipeline_available() -> None:
+    """提前检查是否还能提交主流程任务（如上传文件前）：已有任务在排队或正在运行则拒绝
+
+    只用于尽早拒绝；真正的占用由_enqueue_pipeline中的server_state.claim()原子完成。
+    """
+    busy = app.state.task_queue.full() or server_state.refresh().status in PIPELINE_BUSY_STATUSES
+    if busy:
         raise HTTPException(
             status_code=400,
             detail="已有任务正在运行，请等待当前任务完成或重置状态"
         )
 
-    # 始终自动发现真实的mitm代理配置（忽略用户输入的参数）
-    try:
-        logger.info("🔍 开始自动发现真实运行的mitm代理...")
 
-        # 强制重新发现mitm代理
-        dynamic_config.discover_running_mitmproxy()
+def _enqueue_pipeline(config: Dict[str, Any], offline_mode: bool, input_file: Optional[str]) -> str:
+    """占用主流程任务槽并把任务放入队列，返回任务ID
 
-        # 获取发现的配置
-        discovered_host = dynamic_config.get_mitm_host()
-        discovered_port = dynamic_config.get_mitm_port()
-
-        logger.info(f"✅ 自动发现真实mitm代理: {discovered_host}:{discovered_port}")
-        logger.info(f"📝 用户提供的参数 {request.mitm_host}:{request.mitm_port} 已被自动发现的配置覆盖")
+    任务槽保存在（多worker部署时共享的）状态中：每个worker有各自的队列，只看队列无法阻止
+    不同worker同时提交；结果也只保存在一个状态槽中，同时运行会互相覆盖。
+    """
+    task_id = _new_task_id()
+    try:
+        server_state.claim(task_id, config)
+    except PipelineBusyError:
+        raise HTTPException(
+            status_code=400,
+            detail="已有任务正在运行，请等待当前任务完成或重置状态"
+        )
+    try:
+        app.state.task_queue.put_nowait((task_id, config, offline_mode, input_file))
+    except asyncio.QueueFull:
+        server_state.release(task_id)
+        raise HTTPException(
+            status_code=400,
+            detail="已有任务正在运行，请等待当前任务完成或重置状态"
+        )
+    return task_id
 
-        mitm_host = discovered_host
-        mitm_port = discovered_port
 
-    except Exception as e:
-        logger.error(f"❌ 自动发现失败: {e}")
-        raise HTTPException(status_code=500, detail=f"无法发现运行中的mitm代理: {str(e)}")
+@app.post("/trigger", status_code=202)
+async def trigger_pipeline(request: TriggerRequest, mitm_cfg: Tuple[str, int] = Depends(resolved_mitm_cfg)):
+    """触发集成主流程（在线模式）- 任务入队后立即返回任务ID，进度通过/status查询"""
+    # 始终使用自动发现的真实mitm代理配置（忽略用户输入的参数）
+    mitm_host, mitm_port = mitm_cfg
+    logger.info("✅ 自动发现真实mitm代理: %s:%s", mitm_host, mitm_port)
+    logger.info("📝 用户提供的参数 %s:%s 已被自动发现的配置覆盖", request.mitm_host, request.mitm_port)
 
     config = {
         'mitm_host': mitm_host,
@@ -687,83 +1252,21 @@ async def trigger_pipeline(request: TriggerRequest):
         'output_dir': request.output_dir or 'data'
     }
 
-    logger.info(f"开始同步执行集成主流程任务（在线模式），配置: {config}")
-
-    # 同步执行集成主流程 - 强制使用在线模式
-    await run_pipeline_async(config, offline_mode=False, input_file=None)
-
-    # 检查执行结果
-    if server_state.status == "completed" and server_state.pipeline_result:
-        result = server_state.pipeline_result
+    # 强制使用在线模式
+    task_id = _enqueue_pipeline(config, offline_mode=False, input_file=None)
+    logger.info("集成主流程任务已入队（在线模式）: %s，配置: %s", task_id, config)
 
-        # 读取生成的provider数据，直接返回给前端
-        providers_response = {
-            "success": True,
-            "message": server_state.message,
-            "providers": []
-        }
-
-        try:
-            # 适配集成主流程的结果结构
-            output_files = result.get('output_files', {})
-
-            # 读取Reclaim providers数据
-            providers_file = output_files.get('providers')
-            if providers_file and os.path.exists(providers_file):
-                with open(providers_file, 'r', encoding='utf-8') as f:
-                    providers_data = json.load(f)
-                    # 处理providers数据
-                    if isinstance(providers_data, dict) and 'providers' in providers_data:
-                        providers_section = providers_data['providers']
-                        providers_response['metadata'] = providers_data.get('metadata', {})
-
-                        # 转换索引格式为数组格式
-                        if isinstance(providers_section, dict):
-                            # 新的索引格式：providers是对象，以providerId为key
-                            raw_providers = list(providers_section.values())
-                        elif isinstance(providers_section, list):
-                            # 旧的数组格式
-                            raw_providers = providers_section
-                        else:
-                            raw_providers = []
-                    elif isinstance(providers_data, list):
-                        raw_providers = providers_data
-                    else:
-                        raw_providers = []
-
-                    # 使用统一排序函数进行倒序排序
-                    providers_response['providers'] = sort_providers_by_time(raw_providers, reverse=True)
-
-                    logger.info(f"已读取并排序 {len(providers_response['providers'])} 个 Reclaim providers（按时间倒序）")
-
-        except Exception as e:
-            logger.warning(f"读取provider数据文件失败: {e}")
-            providers_response['message'] = f"主流程执行成功，但读取provider数据失败: {str(e)}"
-
-        logger.info(f"主流程同步执行完成，返回 {len(providers_response['providers'])} 个providers")
-
-        # 添加真实识别到的mitm配置信息到响应中
-        enhanced_response = {
+    return APIResponse(
+        success=True,
+        message="主流程已触发，请通过/status查询进度，完成后通过/providers获取结果",
+        data={
+            "task_id": task_id,
             "mitm_host": mitm_host,  # 真实识别到的host
             "mitm_port": mitm_port,  # 真实识别到的port
-            "providers": providers_response['providers'],
-            "metadata": providers_response['metadata'],
-            "message": providers_response['message']
+            "config": config,
+            "status": "queued"
         }
-
-        return APIResponse(
-            success=True,
-            message=providers_response['message'],
-            data=enhanced_response
-        )
-    else:
-        # 执行失败
-        error_msg = server_state.message if server_state.status == "error" else "执行未完成"
-        logger.error(f"主流程执行失败: {error_msg}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"主流程执行失败: {error_msg}"
-        )
+    )
 
 
 class CreateTaskSessionRequest(BaseModel):
@@ -806,19 +1309,119 @@ def get_attestor_db_dir() -> str:
     return str(db_dir)
 
 
-def _find_latest_providers_file() -> Optional[str]:
-    data_dir = "data"
-    if not os.path.exists(data_dir):
+# 最新provider文件的查找结果缓存：data_dir -> (目录修改时间纳秒, 最新文件路径)
+# 目录中新增、删除或替换文件都会更新目录的修改时间，此时才重新扫描
+_LATEST_PROVIDERS_CACHE: Dict[str, Tuple[int, Optional[str]]] = {}
+
+
+def _scan_latest_providers_file(data_dir: str) -> Optional[Tuple[str, int]]:
+    """扫描目录查找最新的reclaim_providers文件，返回(路径, 修改时间纳秒)"""
+    latest = None
+    try:
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                # 查找集成主流程生成的reclaim_providers文件
+                if entry.name.startswith("reclaim_providers_") and entry.name.endswith(".json") and entry.is_file():
+                    mtime_ns = entry.stat().st_mtime_ns
+                    if latest is None or mtime_ns > latest[1]:
+                        latest = (entry.path, mtime_ns)
+    except FileNotFoundError:
         return None
-    provider_files = []
-    for file in os.listdir(data_dir):
-        if file.startswith("reclaim_providers_") and file.endswith(".json"):
-            file_path = os.path.join(data_dir, file)
-            provider_files.append((file_path, os.path.getmtime(file_path)))
-    if not provider_files:
+    return latest
+
+
+def _latest_providers_file_stat(data_dir: str = "data") -> Optional[Tuple[str, int]]:
+    """查找最新的reclaim_providers文件，返回(路径, 修改时间纳秒)
+
+    目录未变化时直接复用上次扫描得到的路径，只需两次stat；否则重新扫描。
+    """
+    try:
+        dir_mtime_ns = os.stat(data_dir).st_mtime_ns
+    except FileNotFoundError:
         return None
-    latest_file = max(provider_files, key=lambda x: x[1])[0]
-    return latest_file
+    cached = _LATEST_PROVIDERS_CACHE.get(data_dir)
+    if cached is not None and cached[0] == dir_mtime_ns:
+        if cached[1] is None:
+            return None
+        try:
+            return cached[1], os.stat(cached[1]).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    latest = _scan_latest_providers_file(data_dir)
+    _LATEST_PROVIDERS_CACHE[data_dir] = (dir_mtime_ns, latest[0] if latest else None)
+    return latest
+
+
+@lru_cache(maxsize=4)
+def _load_and_sort_providers(path: str, mtime_ns: int) -> Tuple[Dict[str, Any], List[Dict], Dict[str, Dict]]:
+    """读取provider文件并按时间倒序排序，返回(元数据, 排序后的列表, providerId->provider索引)
+
+    以(路径, 修改时间)为缓存键，文件被重新生成或编辑后自动失效。
+    返回的对象会被缓存共享，调用方不能原地修改。
+    """
+    metadata, providers_by_id, providers_array = _load_providers_file(path)
+
+    # 使用统一排序函数进行倒序排序，最新的放在前面
+    return metadata, sort_providers_by_time(providers_array, reverse=True), providers_by_id
+
+
+@lru_cache(maxsize=4)
+def _load_mapped_providers(path: str, mtime_ns: int, mapping_mtime_ns: Optional[int]) -> Tuple[Dict[str, Any], List[Dict]]:
+    """返回(元数据, 按时间倒序且已按域名映射替换loginUrl的provider列表)
+
+    以provider文件和域名映射文件的修改时间为缓存键，任一变化后自动失效；
+    返回的对象会被缓存共享，调用方不能原地修改。
+    """
+    metadata, sorted_providers, _ = _load_and_sort_providers(path, mtime_ns)
+    domain_mapping = _load_domain_homepages_at(mapping_mtime_ns)
+    if not domain_mapping:
+        return metadata, sorted_providers
+
+    # 按域名映射替换 loginUrl（命中则替换为首页链接）
+    # 排序缓存中的对象不能原地修改，只对需要替换的provider做深拷贝
+    replaced_count = 0
+    mapped_providers = []
+    for prov in sorted_providers:
+        current_login = _extract_login_url_from_provider(prov)
+        if current_login:
+            new_home = _get_homepage_for_url(current_login, domain_mapping)
+            if new_home:
+                prov = copy.deepcopy(prov)
+                if _set_login_url_in_provider(prov, new_home):
+                    replaced_count += 1
+        mapped_providers.append(prov)
+    if replaced_count:
+        logger.info("依据域名映射替换了 %s 个 provider 的 loginUrl", replaced_count)
+    return metadata, mapped_providers
+
+
+# 可编辑字段表：(请求字段, 相对providerConfig.providerConfig的路径)
+_EDIT_INNER_FIELDS = (
+    ("loginUrl", ("loginUrl",)),
+    ("geoLocation", ("geoLocation",)),
+    ("injectionType", ("injectionType",)),
+    ("pageTitle", ("pageTitle",)),
+    ("userAgent_ios", ("userAgent", "ios")),
+    ("userAgent_android", ("userAgent", "android")),
+)
+
+# 同步写入metadata和provider_index的字段（字段名与请求字段相同）
+_EDIT_META_FIELDS = ("institution", "api_type", "priority_level", "value_score")
+
+
+def _set_by_path(root: Dict[str, Any], path: Tuple[str, ...], value: Any) -> bool:
+    """沿路径设置值（中间节点缺失或不是对象时创建），返回值是否发生变化"""
+    node = root
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = {}
+            node[key] = child
+        node = child
+    if node.get(path[-1]) == value:
+        return False
+    node[path[-1]] = value
+    return True
 
 
 def _edit_provider_fields(payload: EditProviderRequest, providers_doc: Dict[str, Any], provider_id: str) -> bool:
@@ -844,198 +1447,177 @@ def _edit_provider_fields(payload: EditProviderRequest, providers_doc: Dict[str,
     if not isinstance(inner, dict):
         return False
 
-    # 1) loginUrl
-    if payload.loginUrl is not None:
-        if inner.get("loginUrl") != payload.loginUrl:
-            inner["loginUrl"] = payload.loginUrl
-            changed = True
-
-    # 2) geoLocation
-    if payload.geoLocation is not None:
-        if inner.get("geoLocation") != payload.geoLocation:
-            inner["geoLocation"] = payload.geoLocation
-            changed = True
-
-    # 3) injectionType
-    if payload.injectionType is not None:
-        if inner.get("injectionType") != payload.injectionType:
-            inner["injectionType"] = payload.injectionType
-            changed = True
-
-    # 3.1) pageTitle
-    if payload.pageTitle is not None:
-        if inner.get("pageTitle") != payload.pageTitle:
-            inner["pageTitle"] = payload.pageTitle
-            changed = True
-
-    # 3.2) userAgent
+    # 1) ~ 3.2) providerConfig.providerConfig 下的字段
     if payload.userAgent_ios is not None or payload.userAgent_android is not None:
-        ua = inner.get("userAgent")
-        if not isinstance(ua, dict):
-            ua = {"ios": None, "android": None}
-        if payload.userAgent_ios is not None and ua.get("ios") != payload.userAgent_ios:
-            ua["ios"] = payload.userAgent_ios
-            changed = True
-        if payload.userAgent_android is not None and ua.get("android") != payload.userAgent_android:
-            ua["android"] = payload.userAgent_android
-            changed = True
-        inner["userAgent"] = ua
+        if not isinstance(inner.get("userAgent"), dict):
+            inner["userAgent"] = {"ios": None, "android": None}
+    for attr, path in _EDIT_INNER_FIELDS:
+        value = getattr(payload, attr)
+        if value is not None:
+            changed |= _set_by_path(inner, path, value)
 
     # 4) metadata 同步 + provider_index 同步
     meta = inner.get("metadata")
     if not isinstance(meta, dict):
         meta = {}
         inner["metadata"] = meta
-
-    def set_meta_field(field: str, value: Any):
-        nonlocal changed
-        if value is not None and meta.get(field) != value:
-            meta[field] = value
+    sync_index = isinstance(index_entry, dict)
+    for attr in _EDIT_META_FIELDS:
+        value = getattr(payload, attr)
+        if value is None:
+            continue
+        if meta.get(attr) != value:
+            meta[attr] = value
             changed = True
-        if isinstance(index_entry, dict) and value is not None and index_entry.get(field) != value:
-            index_entry[field] = value
+        if sync_index and index_entry.get(attr) != value:
+            index_entry[attr] = value
             changed = True
 
-    set_meta_field("institution", payload.institution)
-    set_meta_field("api_type", payload.api_type)
-    set_meta_field("priority_level", payload.priority_level)
-    if payload.value_score is not None:
-        # 数值型
-        set_meta_field("value_score", float(payload.value_score))
-
-    # 5) regex 编辑
-    if (
-        payload.regex_value is not None and
-        payload.regex_request_index is not None and
-        payload.regex_match_index is not None
-    ):
-        try:
-            reqs = inner.get("requestData")
-            if isinstance(reqs, list) and 0 <= payload.regex_request_index < len(reqs):
-                req = reqs[payload.regex_request_index]
-                if isinstance(req, dict):
-                    matches = req.get("responseMatches")
-                    if isinstance(matches, list) and 0 <= payload.regex_match_index < len(matches):
-                        m = matches[payload.regex_match_index]
-                        if isinstance(m, dict):
-                            if m.get("value") != payload.regex_value:
-                                m["value"] = payload.regex_value
-                                changed = True
-        except Exception:
-            # 忽略异常，保持幂等
-            pass
+    # 5) regex 编辑（下标已由模型校验为非负整数，这里只需判断类型和越界，不会抛出异常）
+    regex_value = payload.regex_value
+    req_idx = payload.regex_request_index
+    match_idx = payload.regex_match_index
+    if regex_value is not None and req_idx is not None and match_idx is not None:
+        reqs = inner.get("requestData")
+        req = reqs[req_idx] if isinstance(reqs, list) and req_idx < len(reqs) else None
+        matches = req.get("responseMatches") if isinstance(req, dict) else None
+        m = matches[match_idx] if isinstance(matches, list) and match_idx < len(matches) else None
+        if isinstance(m, dict) and m.get("value") != regex_value:
+            m["value"] = regex_value
+            changed = True
 
     return changed
 
 
+# 串行化provider文件的读取-修改-写回
+_PROVIDER_EDIT_LOCK = asyncio.Lock()
+
+
 @app.post("/providers/{provider_id}/edit", response_model=APIResponse)
 async def edit_provider(provider_id: str, payload: EditProviderRequest):
     """编辑指定 provider 的关键字段，并持久化到最新的 providers JSON 文件中"""
-    latest = _find_latest_providers_file()
-    if not latest or not os.path.exists(latest):
+    latest_stat = _latest_providers_file_stat("data")
+    if not latest_stat:
         raise HTTPException(status_code=404, detail="未找到Provider配置文件")
+    latest, mtime_ns = latest_stat
 
+    # 先查缓存中的providerId索引，未找到时无需解析并改写整个文件
     try:
-        with open(latest, "r", encoding="utf-8") as f:
-            doc = json.load(f)
+        _, _, providers_by_id = await asyncio.to_thread(_load_and_sort_providers, latest, mtime_ns)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"读取配置失败: {e}")
-
-    if not _edit_provider_fields(payload, doc, provider_id):
+    if provider_id not in providers_by_id:
         return APIResponse(success=True, message="无字段更改或未找到指定Provider", data={"file_path": latest})
 
-    # 备份原文件
-    try:
-        backup_path = latest + ".bak." + datetime.now().strftime("%Y%m%d%H%M%S")
-        shutil.copyfile(latest, backup_path)
-    except Exception:
-        # 备份失败不阻断
-        pass
+    # 读取-修改-写回期间会让出事件循环，加锁避免并发编辑互相覆盖
+    async with _PROVIDER_EDIT_LOCK:
+        try:
+            doc = await asyncio.to_thread(_load_json_file, latest)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"读取配置失败: {e}")
 
-    # 写回
-    try:
-        with open(latest, "w", encoding="utf-8") as f:
-            json.dump(doc, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"写回配置失败: {e}")
+        if not _edit_provider_fields(payload, doc, provider_id):
+            return APIResponse(success=True, message="无字段更改或未找到指定Provider", data={"file_path": latest})
+
+        # 备份原文件
+        try:
+            backup_path = latest + ".bak." + datetime.now().strftime("%Y%m%d%H%M%S")
+            await asyncio.to_thread(_backup_file, latest, backup_path)
+        except Exception:
+            # 备份失败不阻断
+            pass
+
+        # 原子写回
+        try:
+            await asyncio.to_thread(_replace_json_file, latest, doc)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"写回配置失败: {e}")
 
     return APIResponse(success=True, message="修改成功", data={"file_path": latest, "provider_id": provider_id})
 
 
+def _get_or_create_task_session(base_dir: str, provider_id: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """同一providerId在10分钟内已有Pending session时复用，否则新建（在线程中调用）"""
+    db = TaskSessionDB(base_dir=base_dir)
+    return db.get_or_create_pending_session(
+        provider_id,
+        # 与示例保持一致，提供 completed_at 字段
+        additional_data={"completed_at": time.time()},
+        reuse_seconds=600,
+        max_days_back=7,
+    )
+
+
 @app.post("/task-sessions", response_model=APIResponse)
 async def create_task_session(payload: CreateTaskSessionRequest):
     """新增一条 task_session 记录"""
     try:
         base_dir = get_task_sessions_dir()
-        db = TaskSessionDB(base_dir=base_dir)
-
-        # 在创建前，先检查同一 providerId 是否已存在 Pending 状态的 session
-        try:
-            latest_record = db.get_latest_pending_session_by_provider(payload.providerId, max_days_back=7)
-            if latest_record:
-                # 判断是否超过10分钟
-                def _to_ts(val: Any) -> float:
-                    try:
-                        if isinstance(val, (int, float)):
-                            return float(val)
-                        dt = datetime.fromisoformat(str(val).replace('Z', '+00:00'))
-                        if dt.tzinfo is None:
-                            dt = dt.replace(tzinfo=timezone.utc)
-                        return dt.timestamp()
-                    except Exception:
-                        return 0.0
-
-                created_ts = _to_ts(latest_record.get("created_at") or latest_record.get("updated_at"))
-                is_fresh = (time.time() - created_ts) <= 600  # 10分钟
-
-                if is_fresh:
-                    existing_session_id = latest_record.get("id")
-                    return APIResponse(
-                        success=True,
-                        message="已存在Pending状态的session，返回最新记录",
-                        data={
-                            "session": latest_record,
-                            "session_id": existing_session_id,
-                            "base_dir": base_dir,
-                            "reused": True
-                        }
-                    )
-                # 否则继续创建新session；写入时DB会清理同日超过10分钟的Pending
-        except Exception:
-            # 预检失败不阻断创建流程
-            pass
-
-        session_id = db.create_session(
-            task_id="",
-            provider_id=payload.providerId,
-            additional_data={
-                # 与示例保持一致，提供 completed_at 字段
-                "completed_at": time.time()
-            }
+        # 查找可复用的Pending session与新建记录在DB的一次调用内完成，放到线程中执行不阻塞事件循环
+        record, reused = await asyncio.to_thread(
+            _get_or_create_task_session, base_dir, payload.providerId
         )
 
-        if not session_id:
-            raise HTTPException(status_code=500, detail="创建session失败")
+        if reused:
+            return APIResponse(
+                success=True,
+                message="已存在Pending状态的session，返回最新记录",
+                data={
+                    "session": record,
+                    "session_id": record.get("id"),
+                    "base_dir": base_dir,
+                    "reused": True
+                }
+            )
 
-        # 读取刚创建的记录返回
-        record = db.get_session(session_id)
+        if not record:
+            raise HTTPException(status_code=500, detail="创建session失败")
 
         return APIResponse(
             success=True,
             message="创建session成功",
             data={
                 "session": record,
-                "session_id": session_id,
+                "session_id": record["id"],
                 "base_dir": base_dir
             }
         )
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"创建task session失败: {e}", exc_info=True)
+        logger.error("创建task session失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"创建task session失败: {str(e)}")
 
 
+def _compact_json_line(item: Dict[str, Any]) -> Any:
+    """把对象序列化为单行JSON字符串（保留中文原文），无法序列化时原样返回"""
+    try:
+        if orjson is not None:
+            return orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return item
+
+
+def _compact_array_objects(value: Any) -> Any:
+    """把嵌套结构中数组里的对象原地替换为单行JSON字符串并返回value
+
+    使用显式栈迭代遍历，不递归、不重建中间的dict/list；数组中的对象整体压缩，不再向内遍历。
+    """
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        else:
+            for i, item in enumerate(node):
+                if isinstance(item, dict):
+                    node[i] = _compact_json_line(item)
+                elif isinstance(item, list):
+                    stack.append(item)
+    return value
+
+
 @app.get("/task-sessions/{session_id}/response", response_model=APIResponse)
 async def get_response_by_session(session_id: str):
     """根据 session_id 查询对应的 attestor 响应，优先返回 claim 对象；
@@ -1111,24 +1693,8 @@ async def get_response_by_session(session_id: str):
                 data=base_response_data
             )
 
-        # 4) 压缩 claim 中数组里的对象为单行字符串
-        def compact_array_objects(value: Any) -> Any:
-            if isinstance(value, list):
-                compacted = []
-                for item in value:
-                    if isinstance(item, dict):
-                        try:
-                            compacted.append(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
-                        except Exception:
-                            compacted.append(item)
-                    else:
-                        compacted.append(compact_array_objects(item))
-                return compacted
-            if isinstance(value, dict):
-                return {k: compact_array_objects(v) for k, v in value.items()}
-            return value
-
-        compacted_claim = compact_array_objects(claim_obj)
+        # 4) 压缩 claim 中数组里的对象为单行字符串（claim_obj是刚解析出的新对象，可原地修改）
+        compacted_claim = _compact_array_objects(claim_obj)
         base_response_data["claim"] = compacted_claim
 
         return APIResponse(
@@ -1139,24 +1705,16 @@ async def get_response_by_session(session_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"查询响应失败: {e}", exc_info=True)
+        logger.error("查询响应失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"查询响应失败: {str(e)}")
 
 @app.post("/upload-and-trigger")
 async def upload_and_trigger(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     output_dir: str = "data"
 ):
     """上传mitm文件并触发主流程（离线模式）"""
-    global server_state
-
-    # 检查是否有任务正在运行
-    if server_state.status == "running":
-        raise HTTPException(
-            status_code=400,
-            detail="已有任务正在运行，请等待当前任务完成或重置状态"
-        )
+    _check_pipeline_available()
 
     # 验证文件类型
     if not file.filename.endswith('.mitm'):
@@ -1174,11 +1732,11 @@ async def upload_and_trigger(
         safe_filename = f"upload_{timestamp}_{file.filename}"
         file_path = os.path.join(upload_dir, safe_filename)
 
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # 在一个线程里分块复制整个文件：内存占用与文件大小无关，
+        # 也不会像逐块await读写那样每个块都切换两次线程池
+        file_size = await asyncio.to_thread(_save_upload, file.file, file_path)
 
-        logger.info(f"文件上传成功: {file_path} ({len(content)} bytes)")
+        logger.info("文件上传成功: %s (%s bytes)", file_path, file_size)
 
         # 构建配置
         config = {
@@ -1186,31 +1744,53 @@ async def upload_and_trigger(
             'temp_dir': 'temp'
         }
 
-        # 启动后台任务（离线模式）
-        background_tasks.add_task(run_pipeline_async, config, True, file_path)
+        # 文件写入完成后占用任务槽并把任务放入队列（离线模式）；保存期间可能已有其他任务提交，
+        # 无法入队时删除本次上传的文件，避免在uploads中残留
+        try:
+            task_id = _enqueue_pipeline(config, offline_mode=True, input_file=file_path)
+        except HTTPException:
+            _remove_upload(file_path)
+            raise
 
         return APIResponse(
             success=True,
             message=f"文件上传成功，主流程已触发（离线模式）",
             data={
-                "task_id": server_state.current_task_id,
+                "task_id": task_id,
                 "uploaded_file": file_path,
-                "file_size": len(content),
+                "file_size": file_size,
                 "config": config,
-                "status": server_state.status
+                "status": "queued"
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"文件上传失败: {e}", exc_info=True)
+        logger.error("文件上传失败: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"文件上传失败: {str(e)}"
         )
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """判断请求的If-None-Match是否与当前ETag一致"""
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _set_cache_headers(response: Response, etag: str, mtime: float) -> None:
+    """设置条件请求所需的ETag和Last-Modified响应头"""
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = formatdate(mtime, usegmt=True)
+
+
 @app.get("/providers")
-async def get_providers():
+async def get_providers(request: Request, response: Response):
     """获取最新的Provider列表"""
     try:
         # 查找最新的reclaim_providers文件 (集成主流程生成的格式)
@@ -1222,54 +1802,28 @@ async def get_providers():
                 data={}
             )
 
-        provider_files = []
-        for file in os.listdir(data_dir):
-            # 查找集成主流程生成的reclaim_providers文件
-            if file.startswith("reclaim_providers_") and file.endswith(".json"):
-                file_path = os.path.join(data_dir, file)
-                provider_files.append((file_path, os.path.getmtime(file_path)))
-
-        if not provider_files:
+        latest = _latest_providers_file_stat(data_dir)
+        if not latest:
             return APIResponse(
                 success=False,
                 message="未找到Provider配置文件，请先执行主流程",
                 data={}
             )
 
-        # 获取最新的文件
-        latest_file = max(provider_files, key=lambda x: x[1])[0]
-
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            providers_data = json.load(f)
+        latest_file, mtime_ns = latest
 
-        # 提取providers数据和元数据
-        providers_data_section = providers_data.get('providers', {})
-        metadata = providers_data.get('metadata', {})
+        # 条件请求：provider文件和域名映射文件都未变化时直接返回304
+        mapping_mtime_ns = _domain_homepages_mtime()
+        etag = f'"{mtime_ns}-{mapping_mtime_ns or 0}"'
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={'ETag': etag})
+        _set_cache_headers(response, etag, mtime_ns / 1e9)
 
-        # 转换索引格式为数组格式
-        if isinstance(providers_data_section, dict):
-            # 新的索引格式：providers是对象，以providerId为key
-            providers_array = list(providers_data_section.values())
-        elif isinstance(providers_data_section, list):
-            # 旧的数组格式
-            providers_array = providers_data_section
-        else:
-            providers_array = []
-
-        # 使用统一排序函数进行倒序排序，最新的放在前面
-        sorted_providers = sort_providers_by_time(providers_array, reverse=True)
-
-        # 按域名映射替换 loginUrl（命中则替换为首页链接）
-        domain_mapping = _load_domain_homepages()
-        if isinstance(domain_mapping, dict) and domain_mapping:
-            replaced_count = 0
-            for prov in sorted_providers:
-                current_login = _extract_login_url_from_provider(prov)
-                new_home = _get_homepage_for_url(current_login or "", domain_mapping)
-                if new_home and _set_login_url_in_provider(prov, new_home):
-                    replaced_count += 1
-            if replaced_count:
-                logger.info(f"依据域名映射替换了 {replaced_count} 个 provider 的 loginUrl")
+        # 解析、排序和loginUrl替换的结果按(provider文件, 映射文件)的修改时间缓存，都未变化时直接复用
+        # （缓存未命中时需要解析整个文件，放到线程中执行，不阻塞事件循环）
+        metadata, sorted_providers = await asyncio.to_thread(
+            _load_mapped_providers, latest_file, mtime_ns, mapping_mtime_ns
+        )
 
         return APIResponse(
             success=True,
@@ -1280,56 +1834,68 @@ async def get_providers():
                 "file_path": latest_file,
                 "providers_count": len(sorted_providers),
                 "total_providers": metadata.get('total_providers', len(sorted_providers)),
-                "last_modified": datetime.fromtimestamp(os.path.getmtime(latest_file)).isoformat()
+                "last_modified": datetime.fromtimestamp(mtime_ns / 1e9).isoformat()
             }
         )
 
     except Exception as e:
-        logger.error(f"获取Provider列表失败: {e}", exc_info=True)
+        logger.error("获取Provider列表失败: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"获取Provider列表失败: {str(e)}"
         )
 
 
-@app.get("/files")
-async def list_files():
-    """列出所有输出文件"""
+def _scan_files(dir_name: str, suffix: str, kind: str) -> List[Dict[str, Any]]:
+    """扫描目录中指定后缀的文件；modified为原始时间戳，由调用方排序后再格式化"""
+    files = []
     try:
-        files_info = []
-
-        # 扫描data目录
-        data_dir = "data"
-        if os.path.exists(data_dir):
-            for file in os.listdir(data_dir):
-                if file.endswith('.json'):
-                    file_path = os.path.join(data_dir, file)
-                    stat = os.stat(file_path)
-                    files_info.append({
-                        "filename": file,
-                        "path": file_path,
-                        "size": stat.st_size,
-                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        "type": "output"
+        with os.scandir(dir_name) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    entry_stat = entry.stat()
+                    files.append({
+                        "filename": entry.name,
+                        "path": entry.path,
+                        "size": entry_stat.st_size,
+                        "modified": entry_stat.st_mtime,
+                        "type": kind
                     })
+    except FileNotFoundError:
+        return []
+    return files
 
-        # 扫描uploads目录
-        uploads_dir = "uploads"
-        if os.path.exists(uploads_dir):
-            for file in os.listdir(uploads_dir):
-                if file.endswith('.mitm'):
-                    file_path = os.path.join(uploads_dir, file)
-                    stat = os.stat(file_path)
-                    files_info.append({
-                        "filename": file,
-                        "path": file_path,
-                        "size": stat.st_size,
-                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        "type": "upload"
-                    })
 
-        # 按修改时间排序
-        files_info.sort(key=lambda x: x['modified'], reverse=True)
+def _scan_output_files() -> List[Dict[str, Any]]:
+    """扫描data目录的输出文件和uploads目录的上传文件（在线程中调用）"""
+    return _scan_files("data", ".json", "output") + _scan_files("uploads", ".mitm", "upload")
+
+
+@app.get("/files")
+async def list_files(request: Request, response: Response):
+    """列出所有输出文件"""
+    try:
+        # 扫描data目录和uploads目录；目录较大时扫描耗时，放到线程中执行不阻塞其他请求
+        files_info = await asyncio.to_thread(_scan_output_files)
+
+        # 条件请求：文件列表（路径、大小、修改时间）未变化时直接返回304
+        if files_info:
+            listing = "|".join(f"{f['path']}:{f['size']}:{f['modified']}" for f in files_info)
+            etag = f'"{zlib.crc32(listing.encode("utf-8")):08x}-{len(files_info)}"'
+            if _etag_matches(request, etag):
+                return Response(status_code=304, headers={'ETag': etag})
+            _set_cache_headers(response, etag, max(f['modified'] for f in files_info))
+
+        # 按修改时间排序（比较原始时间戳），排序后再格式化为ISO字符串；
+        # 同一流程生成的文件常共享相同的修改时间，相同时间戳只格式化一次
+        files_info.sort(key=itemgetter('modified'), reverse=True)
+        iso_cache: Dict[float, str] = {}
+        for info in files_info:
+            mtime = info['modified']
+            iso = iso_cache.get(mtime)
+            if iso is None:
+                iso = iso_cache[mtime] = datetime.fromtimestamp(mtime).isoformat()
+            info['modified'] = iso
 
         return APIResponse(
             success=True,
@@ -1341,13 +1907,19 @@ async def list_files():
         )
 
     except Exception as e:
-        logger.error(f"列出文件失败: {e}", exc_info=True)
+        logger.error("列出文件失败: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"列出文件失败: {str(e)}"
         )
 
 
+class _DownloadFileResponse(FileResponse):
+    """下载用的FileResponse：按1 MiB分块读取发送（默认64 KiB），大文件的读调用次数更少"""
+
+    chunk_size = 1 << 20
+
+
 @app.get("/download/{file_type}/{filename}")
 async def download_file(file_type: str, filename: str):
     """下载文件"""
@@ -1360,32 +1932,61 @@ async def download_file(file_type: str, filename: str):
         else:
             raise HTTPException(status_code=400, detail="无效的文件类型")
 
-        file_path = os.path.join(base_dir, filename)
+        # 安全检查：文件名不能包含路径分隔符，解析后的路径必须位于指定目录内
+        # （Path.is_relative_to按路径组件比较，不会把data_backup误判为data下的文件）
+        if os.sep in filename or (os.altsep and os.altsep in filename):
+            raise HTTPException(status_code=403, detail="访问被拒绝")
+        base = Path(base_dir).resolve()
+        target = (base / filename).resolve()
+        if not target.is_relative_to(base):
+            raise HTTPException(status_code=403, detail="访问被拒绝")
 
-        # 验证文件存在且在允许的目录内
-        if not os.path.exists(file_path):
+        # 验证文件存在；stat结果直接交给FileResponse，发送时不再重复stat
+        try:
+            file_stat = target.stat()
+        except FileNotFoundError:
+            file_stat = None
+        if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
             raise HTTPException(status_code=404, detail="文件不存在")
 
-        # 安全检查：确保文件在指定目录内
-        if not os.path.abspath(file_path).startswith(os.path.abspath(base_dir)):
-            raise HTTPException(status_code=403, detail="访问被拒绝")
-
-        return FileResponse(
-            path=file_path,
+        return _DownloadFileResponse(
+            path=target,
             filename=filename,
-            media_type='application/octet-stream'
+            media_type='application/octet-stream',
+            stat_result=file_stat
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"下载文件失败: {e}", exc_info=True)
+        logger.error("下载文件失败: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"下载文件失败: {str(e)}"
         )
 
 
+def _select_uvicorn_impls() -> Tuple[str, str]:
+    """选择uvicorn的事件循环和HTTP解析实现
+
+    优先使用uvloop + httptools（uvicorn[standard]自带），
+    未安装时（如Windows）回退到asyncio + h11。
+    """
+    try:
+        import uvloop
+        loop_impl = "uvloop"
+    except ImportError:
+        loop_impl = "asyncio"
+
+    try:
+        import httptools
+        http_impl = "httptools"
+    except ImportError:
+        http_impl = "h11"
+
+    return loop_impl, http_impl
+
+
 def main():
     """启动API服务器"""
     # 从环境变量获取配置，如果没有则使用默认值
@@ -1417,14 +2018,23 @@ def main():
     print("🛑 按 Ctrl+C 停止服务")
     print()
 
+    # 多worker时清除上次运行残留的共享状态（如异常退出时停留在running），seq继续递增
+    if API_WORKERS > 1:
+        server_state.reset()
+
     # 启动服务器
+    loop_impl, http_impl = _select_uvicorn_impls()
+    print(f"⚙️  事件循环: {loop_impl}, HTTP解析: {http_impl}, 工作进程: {API_WORKERS}")
     try:
         uvicorn.run(
             "independent_api_server:app",
             host=host,
             port=port,
             reload=False,
-            log_level="info"
+            log_level=os.getenv("UVICORN_LOG_LEVEL", "info"),
+            workers=API_WORKERS,
+            loop=loop_impl,
+            http=http_impl
         )
     except OSError as e:
         if "Address already in use" in str(e):
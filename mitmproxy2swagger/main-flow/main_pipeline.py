@@ -46,7 +46,7 @@ logger = logging.getLogger(__name__)
 
 # 导入我们的模块  
 from feature_library_pipeline import FeatureLibraryPipeline
-from dynamic_config import dynamic_config
+from dynamic_config import get_dynamic_config
 
 
 
@@ -58,8 +58,8 @@ class MainPipeline:
         
         # 默认配置 - 使用动态配置管理器
         self.default_config = {
-            'mitm_host': dynamic_config.get_mitm_host(),
-            'mitm_port': dynamic_config.get_mitm_port(),
+            'mitm_host': get_dynamic_config().get_mitm_host(),
+            'mitm_port': get_dynamic_config().get_mitm_port(),
             'output_dir': 'data',
             'temp_dir': 'temp',
             'testdata_dir': '../testdata'
@@ -472,10 +472,10 @@ def main():
     parser = argparse.ArgumentParser(description="银行Provider生成主流程")
     
     # mitm配置
-    parser.add_argument('--mitm-host', default=dynamic_config.get_mitm_host(),
-                       help=f'mitmproxy主机地址 (默认: {dynamic_config.get_mitm_host()})')
-    parser.add_argument('--mitm-port', type=int, default=dynamic_config.get_mitm_port(),
-                       help=f'mitmproxy端口号 (默认: {dynamic_config.get_mitm_port()})')
+    parser.add_argument('--mitm-host', default=get_dynamic_config().get_mitm_host(),
+                       help=f'mitmproxy主机地址 (默认: {get_dynamic_config().get_mitm_host()})')
+    parser.add_argument('--mitm-port', type=int, default=get_dynamic_config().get_mitm_port(),
+                       help=f'mitmproxy端口号 (默认: {get_dynamic_config().get_mitm_port()})')
     
     # 离线模式
     parser.add_argument('--offline', action='store_true',
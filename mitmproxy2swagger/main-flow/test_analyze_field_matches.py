@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""字段上下文提取测试：整体解析结果与 find_field_in_json 一致，且每个响应只解析一次"""
+
+import json
+
+import analyze_field_matches as afm
+
+
+PATTERNS = afm.prepare_patterns({
+    'currency': {'type': 'contains', 'value': '"currency"'},
+    'balance': {'type': 'contains', 'value': '"balance"'},
+})
+
+
+def test_contexts_follow_find_field_in_json_order():
+    doc = {
+        "currency": "USD",
+        "a": {"x": {"currency": "HKD", "balance": 1}},
+        "items": [{"currency": "CNY"}, {"currency": "EUR", "balance": 2.5}],
+        "balance": "0",
+    }
+    raw = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+
+    matches = afm.analyze_response_content(raw, PATTERNS)
+    for field in ("currency", "balance"):
+        expected = afm.find_field_in_json(doc, field)[:afm.MAX_CONTEXTS]
+        assert matches[field]['contexts'] == expected
+
+
+def test_response_is_parsed_once_for_all_fields(monkeypatch):
+    calls = []
+    original = afm.parse_json_document
+
+    def counting_parse(content, raw=None):
+        calls.append(raw)
+        return original(content, raw)
+
+    monkeypatch.setattr(afm, "parse_json_document", counting_parse)
+    raw = b'[{"currency": "USD", "balance": 1}, {"currency": "HKD"}]'
+    matches = afm.analyze_response_content(raw, PATTERNS)
+
+    assert set(matches) == {"currency", "balance"}
+    assert len(calls) == 1
+
+
+def test_non_json_response_falls_back_to_fragments():
+    raw = b'callback({"currency": "USD"}); var x = {"balance": "1"};'
+    matches = afm.analyze_response_content(raw, PATTERNS)
+    assert matches['currency']['contexts'] == [{"currency": "USD"}]
+    assert matches['balance']['contexts'] == [{"balance": "1"}]
+
+
+def test_field_scanner_matches_substring_search(monkeypatch):
+    names = [f"field{i}" for i in range(afm.AHOCORASICK_MIN_NEEDLES + 4)]
+    patterns = afm.prepare_patterns({name: {'type': 'contains', 'value': f'"{name}"'} for name in names})
+    raw = b'{"field1": 1, "field12": "\xe4\xbd\xa0", "other": [{"field19": null}]}'
+    expected = {"field1", "field12", "field19"}
+
+    # 搜索串较少时总是逐个子串查找；超过阈值时（有pyahocorasick则用自动机）结果一致
+    assert afm.build_field_scanner(patterns)(raw) == expected
+    monkeypatch.setattr(afm, "AHOCORASICK_MIN_NEEDLES", len(names))
+    assert afm.build_field_scanner(patterns)(raw) == expected
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""DynamicConfig 发现失败后的重试测试"""
+
+import http.server
+import socket
+import threading
+
+import pytest
+
+import dynamic_config as dc
+
+
+def test_failed_discovery_is_retried_after_interval(tmp_path, monkeypatch):
+    monkeypatch.delenv("MITM_HOST", raising=False)
+    monkeypatch.delenv("MITM_PORT", raising=False)
+    config = dc.DynamicConfig(config_file=str(tmp_path / "missing.json"))
+
+    now = [1000.0]
+    monkeypatch.setattr(dc.time, "monotonic", lambda: now[0])
+    calls = []
+
+    def discover(use_cache=True):
+        calls.append(use_cache)
+        config._discovery_attempted_at = dc.time.monotonic()
+        if len(calls) == 1:
+            return None, None
+        config._discovered_host, config._discovered_port = "127.0.0.1", 8081
+        return "127.0.0.1", 8081
+
+    monkeypatch.setattr(config, "discover_running_mitmproxy", discover)
+
+    # 失败后同一轮取值（先host后port）不重复扫描
+    assert config.get_mitm_host() == "127.0.0.1"
+    assert config.get_mitm_port() == 8080
+    assert len(calls) == 1
+
+    # 超过重试间隔后重新发现，mitmproxy启动后能被发现
+    now[0] += dc._DISCOVERY_RETRY_INTERVAL
+    assert config.get_mitm_port() == 8081
+    assert len(calls) == 2
+
+
+class _FakeMitmwebHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"<html><title>mitmweb</title></html>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_mitmweb():
+    server = http.server.HTTPServer(("127.0.0.1", 0), _FakeMitmwebHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_batch_tcp_alive_reports_listening_endpoints(fake_mitmweb):
+    closed = _closed_port()
+    config = dc.DynamicConfig.__new__(dc.DynamicConfig)
+    alive = config._batch_tcp_alive([("127.0.0.1", fake_mitmweb), ("127.0.0.1", closed)])
+    assert alive == {("127.0.0.1", fake_mitmweb)}
+
+
+def test_discovery_falls_back_to_endpoint_scan(tmp_path, monkeypatch, fake_mitmweb):
+    monkeypatch.delenv("MITM_HOST", raising=False)
+    monkeypatch.delenv("MITM_PORT", raising=False)
+    monkeypatch.setattr(dc, "_CACHE_PATH", tmp_path / "mitm_discovery.json")
+    closed = _closed_port()
+    # 优先组合都不可用，剩余组合中的第二个才是mitmweb
+    monkeypatch.setattr(dc, "_PRIORITY_COMBOS", (("127.0.0.1", closed),))
+    monkeypatch.setattr(dc, "_REMAINING_COMBOS", (("127.0.0.1", closed), ("127.0.0.1", fake_mitmweb)))
+
+    # 只探测本机端点，不访问固定配置中的远程地址
+    real_check = dc._check_mitmweb
+    monkeypatch.setattr(dc, "_check_mitmweb", lambda host, port: host == "127.0.0.1" and real_check(host, port))
+    config = dc.DynamicConfig(config_file=str(tmp_path / "missing.json"))
+    monkeypatch.setattr(config, "_scan_mitmproxy_processes", lambda: None)
+
+    assert config.discover_running_mitmproxy(use_cache=False) == ("127.0.0.1", fake_mitmweb)
+    assert (config._discovered_host, config._discovered_port) == ("127.0.0.1", fake_mitmweb)
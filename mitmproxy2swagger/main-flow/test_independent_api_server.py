@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""独立API服务器测试：主流程任务提交保护"""
+
+import importlib
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # 服务器使用相对路径的data/uploads/logs目录，切换到临时目录后再导入
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("independent_api_server")
+    module.server_state.reset()
+    monkeypatch.setitem(module.app.dependency_overrides, module.resolved_mitm_cfg, lambda: ("127.0.0.1", 8080))
+    yield module
+    module.server_state.reset()
+
+
+class BlockingPipeline:
+    """替代IntegratedMainPipeline：运行到release被设置后才结束"""
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def __init__(self, config):
+        self.config = config
+
+    def run_full_pipeline(self, offline_mode=False, input_file=None):
+        BlockingPipeline.started.set()
+        BlockingPipeline.release.wait(10)
+        return {"success": True, "report": {}, "output_files": {}}
+
+
+@pytest.fixture
+def blocking_pipeline(server, monkeypatch):
+    BlockingPipeline.started.clear()
+    BlockingPipeline.release.clear()
+    monkeypatch.setattr(server, "IntegratedMainPipeline", BlockingPipeline)
+    yield BlockingPipeline
+    BlockingPipeline.release.set()
+
+
+def _wait_for_status(client, expected, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get("/status").json()["data"]["status"]
+        if status == expected:
+            return
+        time.sleep(0.02)
+    raise AssertionError(f"状态未变为 {expected}")
+
+
+def test_trigger_rejected_while_task_is_running(server, blocking_pipeline):
+    with TestClient(server.app) as client:
+        first = client.post("/trigger", json={})
+        assert first.status_code == 202
+        assert first.json()["data"]["status"] == "queued"
+
+        # worker取出任务后队列为空，但任务仍在运行，新的提交必须被拒绝
+        assert blocking_pipeline.started.wait(10)
+        assert server.app.state.task_queue.empty()
+        assert client.post("/trigger", json={}).status_code == 400
+
+        blocking_pipeline.release.set()
+        _wait_for_status(client, "completed")
+
+        second = client.post("/trigger", json={})
+        assert second.status_code == 202
+        assert second.json()["data"]["task_id"] != first.json()["data"]["task_id"]
+        _wait_for_status(client, "completed")
+
+
+def test_upload_rejected_after_save_leaves_no_file(server, blocking_pipeline, monkeypatch, tmp_path):
+    original_save = server._save_upload
+
+    def save_then_start_other_task(src, dest_path):
+        size = original_save(src, dest_path)
+        # 模拟保存期间其他请求提交的任务已开始运行
+        server.server_state.update(status="running")
+        return size
+
+    monkeypatch.setattr(server, "_save_upload", save_then_start_other_task)
+    with TestClient(server.app) as client:
+        response = client.post("/upload-and-trigger", files={"file": ("capture.mitm", b"x" * 1024)})
+        assert response.status_code == 400
+        assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_shared_state_file_is_not_reset_by_new_worker(server, tmp_path):
+    state_file = str(tmp_path / "server_state.json")
+    first = server.ServerState(state_file)
+    first.update(status="running", current_task_id="task-1")
+
+    # 新启动（或被重启）的worker不能用空闲状态覆盖共享状态
+    second = server.ServerState(state_file)
+    assert second.snapshot.status == "running"
+    assert second.snapshot.current_task_id == "task-1"
+
+
+def test_shared_state_seq_is_monotonic_across_workers(server, tmp_path):
+    state_file = str(tmp_path / "server_state.json")
+    workers = [server.ServerState(state_file) for _ in range(3)]
+
+    seqs = []
+    for i in range(9):
+        seqs.append(workers[i % 3].update(progress=i).seq)
+    seqs.append(workers[0].reset().seq)
+
+    assert seqs == sorted(set(seqs))
+    assert workers[2].refresh().seq == seqs[-1]
+
+
+def test_backup_is_not_affected_by_in_place_rewrite(server, tmp_path):
+    src = tmp_path / "providers.json"
+    src.write_text('{"v": 1}', encoding="utf-8")
+    backup = tmp_path / "providers.json.bak"
+    server._backup_file(str(src), str(backup))
+
+    # provider构建流程会原地改写当天的配置文件，备份必须保持旧内容
+    with open(src, "r+", encoding="utf-8") as f:
+        f.write('{"v": 2}')
+    assert backup.read_text(encoding="utf-8") == '{"v": 1}'
+
+
+def test_replace_json_file_failure_removes_temp_file(server, tmp_path):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    path = config_dir / "providers.json"
+    path.write_text('{"v": 1}', encoding="utf-8")
+
+    with pytest.raises(TypeError):
+        server._replace_json_file(str(path), {"v": object()})
+    assert path.read_text(encoding="utf-8") == '{"v": 1}'
+    assert [p.name for p in config_dir.iterdir()] == ["providers.json"]
+
+
+def test_ui_page_is_served_from_memory(server, monkeypatch):
+    expected = server.WEB_EXTENSION_PATH.read_bytes()
+    # 页面在启动时已读入内存，请求处理时不再读取文件
+    monkeypatch.setattr(server, "WEB_EXTENSION_PATH", server.Path("/nonexistent/web_extension.html"))
+    with TestClient(server.app) as client:
+        response = client.get("/ui/domain-homepages")
+    assert response.status_code == 200
+    assert response.content == expected
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+
+
+def _provider(name, generated_at):
+    return {"name": name, "providerConfig": {"providerConfig": {"metadata": {"generated_at": generated_at}}}}
+
+
+def test_sort_providers_by_time_mixed_formats(server):
+    providers = [
+        _provider("naive", "2024-01-01T10:00:00"),
+        _provider("utc_z", "2024-01-01T09:30:00Z"),
+        # +08:00 的11:00即UTC 03:00，早于其他所有时间
+        _provider("offset", "2024-01-01T11:00:00+08:00"),
+        _provider("fraction", "2024-01-01T10:00:00.500000"),
+        _provider("missing", None),
+        _provider("invalid", "not a timestamp"),
+        {"name": "bad_config", "providerConfig": "oops"},
+    ]
+
+    ordered = [p["name"] for p in server.sort_providers_by_time(providers)]
+    # 缺少或无法解析时间戳的provider视为最新，排在最前（稳定排序保持原顺序）
+    assert ordered == ["missing", "invalid", "bad_config", "fraction", "naive", "utc_z", "offset"]
+
+    ascending = [p["name"] for p in server.sort_providers_by_time(providers, reverse=False)]
+    assert ascending[:4] == ["offset", "utc_z", "naive", "fraction"]
+
+
+def test_provider_sort_key_fast_path_matches_parsing(server):
+    for value in ("2024-03-05T07:08:09", "2024-03-05T07:08:09Z"):
+        assert server._provider_sort_key(_provider("p", value)) == server._normalize_provider_timestamp(value)
+
+
+def test_claim_is_exclusive_across_workers(server, tmp_path):
+    state_file = str(tmp_path / "server_state.json")
+    worker_a = server.ServerState(state_file)
+    worker_b = server.ServerState(state_file)
+
+    assert worker_a.claim("task-a", {}).status == "queued"
+    # 另一个worker的队列为空，但共享状态中的任务槽已被占用
+    with pytest.raises(server.PipelineBusyError):
+        worker_b.claim("task-b", {})
+
+    # 只释放自己占用的任务槽
+    worker_b.release("task-b")
+    assert worker_a.refresh().current_task_id == "task-a"
+    worker_a.release("task-a")
+    assert worker_b.claim("task-b", {}).current_task_id == "task-b"
+
+
+def test_trigger_rejected_while_another_worker_has_queued_task(server):
+    with TestClient(server.app) as client:
+        server.server_state.claim("other-worker-task", {})
+        assert client.post("/trigger", json={}).status_code == 400
+        assert client.post("/reset").status_code == 400
+
+
+def test_enqueue_failure_releases_claimed_slot(server, monkeypatch):
+    with TestClient(server.app) as client:
+        # 本worker的队列已满（如上一个任务尚未被取出），入队失败后不能一直占着任务槽
+        monkeypatch.setattr(server.app.state.task_queue, "put_nowait",
+                            lambda item: (_ for _ in ()).throw(server.asyncio.QueueFull()))
+        assert client.post("/trigger", json={}).status_code == 400
+        assert server.server_state.refresh().status == "idle"
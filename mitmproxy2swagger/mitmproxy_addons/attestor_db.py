@@ -14,6 +14,14 @@ from typing import Dict, List, Optional, Any
 import threading
 import time
 
+# orjson为可选依赖：可用时用于解析jsonl记录，否则使用标准库json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
 
 class AttestorDB:
     """简单的文件数据库，用于存储 attestor 数据"""
@@ -186,6 +194,21 @@ class AttestorDB:
         except Exception as e:
             print(f"❌ 更新索引失败: {e}")
 
+    @staticmethod
+    def _find_record_in_file(file_path: Path, request_id: str) -> Optional[Dict[str, Any]]:
+        """在jsonl文件中查找request_id匹配的记录
+
+        以二进制逐行读取，先用request_id的字节串过滤，只解析可能匹配的行。
+        """
+        needle = json.dumps(request_id, ensure_ascii=False).encode("utf-8")
+        with open(file_path, "rb") as f:
+            for line in f:
+                if needle in line:
+                    record = _loads(line)
+                    if record["request_id"] == request_id:
+                        return record
+        return None
+
     def get_request(self, request_id: str, date_str: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         根据请求ID获取请求数据
@@ -208,14 +231,7 @@ class AttestorDB:
             if not request_file.exists():
                 return None
 
-            with open(request_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        record = json.loads(line)
-                        if record["request_id"] == request_id:
-                            return record
-
-            return None
+            return self._find_record_in_file(request_file, request_id)
 
         except Exception as e:
             print(f"❌ 获取请求失败: {e}")
@@ -243,14 +259,7 @@ class AttestorDB:
             if not response_file.exists():
                 return None
 
-            with open(response_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        record = json.loads(line)
-                        if record["request_id"] == request_id:
-                            return record
-
-            return None
+            return self._find_record_in_file(response_file, request_id)
 
         except Exception as e:
             print(f"❌ 获取响应失败: {e}")
@@ -263,12 +272,9 @@ class AttestorDB:
             index_files = sorted(self.index_dir.glob("index_*.jsonl"), reverse=True)
 
             for index_file in index_files:
-                with open(index_file, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if line.strip():
-                            record = json.loads(line)
-                            if record["request_id"] == request_id:
-                                return record["date"]
+                record = self._find_record_in_file(index_file, request_id)
+                if record is not None:
+                    return record["date"]
 
             return None
 
@@ -7,12 +7,63 @@ Task Session 数据库模块
 import json
 import os
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import threading
 import time
 from enum import Enum
+from functools import lru_cache
+
+# orjson为可选依赖：可用时用于读写session文件，否则使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Pending状态的session超过该时长（秒）后在写入时清理
+PENDING_EXPIRE_SECONDS = 10 * 60
+
+# 按数据库目录共享的线程锁：同一目录的多个TaskSessionDB实例（如API服务器每个请求新建的实例）
+# 读-改-写同一个分片文件时互斥，避免并发写入互相覆盖
+_DIR_LOCKS: Dict[str, threading.Lock] = {}
+_DIR_LOCKS_GUARD = threading.Lock()
+
+
+def _get_dir_lock(base_dir: Path) -> threading.Lock:
+    """获取指定数据库目录共享的锁"""
+    key = str(base_dir.resolve())
+    with _DIR_LOCKS_GUARD:
+        lock = _DIR_LOCKS.get(key)
+        if lock is None:
+            lock = _DIR_LOCKS[key] = threading.Lock()
+        return lock
+
+
+@lru_cache(maxsize=4096)
+def _iso_to_ts(dt_str: str) -> float:
+    """解析ISO时间字符串为时间戳，结果按字符串缓存；无时区视为UTC，无法解析时返回负无穷"""
+    try:
+        # 兼容Z结尾（切片替换，不扫描整个字符串）
+        if dt_str.endswith('Z'):
+            dt_str = dt_str[:-1] + '+00:00'
+        dt = datetime.fromisoformat(dt_str)
+    except ValueError:
+        return float('-inf')
+    if dt.tzinfo is None:
+        # 视为UTC
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _parse_iso_to_ts(dt_val: Any) -> float:
+    """把ISO时间字符串或数值时间戳转换为时间戳，无法解析时返回负无穷"""
+    if dt_val is None:
+        return float('-inf')
+    # 支持数值型时间戳，直接返回
+    if isinstance(dt_val, (int, float)):
+        return float(dt_val)
+    return _iso_to_ts(str(dt_val))
 
 
 class SessionStatus(Enum):
@@ -36,8 +87,8 @@ class TaskSessionDB:
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
-        # 线程锁，确保并发安全
-        self._lock = threading.Lock()
+        # 线程锁，确保并发安全（同一目录的所有实例共享）
+        self._lock = _get_dir_lock(self.base_dir)
 
         # 内存索引缓存
         self._index_cache = {}
@@ -69,6 +120,8 @@ class TaskSessionDB:
             }
 
         try:
+            if orjson is not None:
+                return orjson.loads(file_path.read_bytes())
             with open(file_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
@@ -92,19 +145,16 @@ class TaskSessionDB:
             try:
                 sessions = data.get("sessions", {}) or {}
                 if isinstance(sessions, dict) and sessions:
-                    now_utc = datetime.now(timezone.utc)
-                    cutoff = now_utc - timedelta(minutes=10)
+                    cutoff_ts = time.time() - PENDING_EXPIRE_SECONDS
                     to_delete = []
                     for sid, record in sessions.items():
                         try:
                             if record.get("status") == SessionStatus.PENDING.value:
                                 created_at = record.get("created_at")
                                 if created_at:
-                                    created_dt = datetime.fromisoformat(created_at)
-                                    # 若为naive，则视为UTC
-                                    if created_dt.tzinfo is None:
-                                        created_dt = created_dt.replace(tzinfo=timezone.utc)
-                                    if created_dt < cutoff:
+                                    # 无法解析的时间返回负无穷，保留该记录
+                                    created_ts = _parse_iso_to_ts(created_at)
+                                    if float('-inf') < created_ts < cutoff_ts:
                                         to_delete.append(sid)
                         except Exception:
                             # 单条异常不影响整体清理
@@ -121,13 +171,35 @@ class TaskSessionDB:
             data["metadata"]["last_updated"] = datetime.now(timezone.utc).isoformat()
             data["metadata"]["total_sessions"] = len(data.get("sessions", {}))
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                file_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
             return True
         except Exception as e:
             print(f"❌ 保存session文件失败 {file_path}: {e}")
             return False
 
+    @staticmethod
+    def _new_session_record(task_id: str, provider_id: str, current_time: float,
+                            additional_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """构造一条新的Pending session记录"""
+        now_iso = datetime.fromtimestamp(current_time, tz=timezone.utc).isoformat()
+        session_record = {
+            "id": str(uuid.uuid4()),
+            "taskId": task_id,
+            "providerId": provider_id,
+            "status": SessionStatus.PENDING.value,
+            "created_at": now_iso,
+            "updated_at": now_iso
+        }
+
+        # 添加额外数据
+        if additional_data:
+            session_record.update(additional_data)
+        return session_record
+
     def create_session(self, task_id: str, provider_id: str,
                       additional_data: Optional[Dict[str, Any]] = None) -> str:
         """
@@ -141,22 +213,10 @@ class TaskSessionDB:
         Returns:
             session_id: 生成的session ID
         """
-        session_id = str(uuid.uuid4())
         current_time = time.time()
         date_str = self._get_date_str(current_time)
-
-        session_record = {
-            "id": session_id,
-            "taskId": task_id,
-            "providerId": provider_id,
-            "status": SessionStatus.PENDING.value,
-            "created_at": datetime.fromtimestamp(current_time, tz=timezone.utc).isoformat(),
-            "updated_at": datetime.fromtimestamp(current_time, tz=timezone.utc).isoformat()
-        }
-
-        # 添加额外数据
-        if additional_data:
-            session_record.update(additional_data)
+        session_record = self._new_session_record(task_id, provider_id, current_time, additional_data)
+        session_id = session_record["id"]
 
         with self._lock:
             # 加载当天的数据
@@ -282,35 +342,29 @@ class TaskSessionDB:
         Returns:
             最新的 Pending session 记录，若不存在返回 None
         """
+        return self._find_latest_pending_session(provider_id, max_days_back)[0]
+
+    def _find_latest_pending_session(self, provider_id: str, max_days_back: int,
+                                     loaded: Optional[Dict[str, Dict[str, Any]]] = None
+                                     ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """查找指定 provider 的最新 Pending session，返回(记录, 创建时间戳)
+
+        loaded为已加载的 日期->session数据，命中时不再重复读取文件。
+        """
         if not provider_id:
-            return None
+            return None, float('-inf')
 
         latest_record: Optional[Dict[str, Any]] = None
         latest_ts: float = float('-inf')
 
-        def _parse_iso_to_ts(dt_val: Any) -> float:
-            try:
-                if dt_val is None:
-                    return float('-inf')
-                # 支持数值型时间戳
-                if isinstance(dt_val, (int, float)):
-                    return float(dt_val)
-                dt_str = str(dt_val)
-                # 兼容Z结尾
-                dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-                if dt.tzinfo is None:
-                    # 视为UTC
-                    dt = dt.replace(tzinfo=timezone.utc)
-                return dt.timestamp()
-            except Exception:
-                return float('-inf')
-
         # 遍历最近几天的分片文件（与 get_pending_sessions 一致的策略）
         for days_back in range(max_days_back + 1):
             timestamp = time.time() - (days_back * 24 * 60 * 60)
             date_str = self._get_date_str(timestamp)
 
-            data = self._load_sessions_for_date(date_str)
+            data = loaded.get(date_str) if loaded else None
+            if data is None:
+                data = self._load_sessions_for_date(date_str)
             for _sid, session_record in (data.get("sessions", {}) or {}).items():
                 try:
                     if session_record.get("status") != SessionStatus.PENDING.value:
@@ -330,7 +384,39 @@ class TaskSessionDB:
                     # 单条异常不影响整体
                     continue
 
-        return latest_record
+        return latest_record, latest_ts
+
+    def get_or_create_pending_session(self, provider_id: str,
+                                      additional_data: Optional[Dict[str, Any]] = None,
+                                      reuse_seconds: float = 600,
+                                      max_days_back: int = 7) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """复用或新建指定 provider 的 Pending session
+
+        在一次加锁内完成：查找最新的Pending session，创建时间在reuse_seconds内则直接复用；
+        否则在当天的分片中新建一条并写回。当天分片只读取一次，新建后直接返回记录，无需再查询。
+
+        Returns:
+            (session记录, 是否复用)；保存失败时返回(None, False)
+        """
+        current_time = time.time()
+        date_str = self._get_date_str(current_time)
+
+        with self._lock:
+            data = self._load_sessions_for_date(date_str)
+            latest_record, latest_ts = self._find_latest_pending_session(
+                provider_id, max_days_back, loaded={date_str: data}
+            )
+            if latest_record is not None and current_time - latest_ts <= reuse_seconds:
+                return latest_record, True
+
+            # 否则新建session；写入时会清理同日超过10分钟的Pending
+            session_record = self._new_session_record("", provider_id, current_time, additional_data)
+            data["sessions"][session_record["id"]] = session_record
+            if self._save_sessions_for_date(date_str, data):
+                print(f"✅ 创建session成功: {session_record['id']} (providerId: {provider_id})")
+                return session_record, False
+            print(f"❌ 创建session失败: {session_record['id']}")
+            return None, False
 
     def list_sessions_by_date(self, date_str: str) -> List[Dict[str, Any]]:
         """
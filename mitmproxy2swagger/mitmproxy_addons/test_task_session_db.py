@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""TaskSessionDB 的复用/新建与并发写入测试"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+from mitmproxy_addons.task_session_db import SessionStatus, TaskSessionDB
+
+
+def test_get_or_create_pending_session_reuses_fresh_session(tmp_path):
+    db = TaskSessionDB(base_dir=str(tmp_path))
+
+    record, reused = db.get_or_create_pending_session("p1", additional_data={"completed_at": 1.0})
+    assert reused is False
+    assert record["providerId"] == "p1"
+    assert record["status"] == SessionStatus.PENDING.value
+    assert record["completed_at"] == 1.0
+    assert db.get_session(record["id"]) == record
+
+    again, reused = db.get_or_create_pending_session("p1")
+    assert reused is True
+    assert again["id"] == record["id"]
+
+    other, reused = db.get_or_create_pending_session("p2")
+    assert reused is False
+    assert other["id"] != record["id"]
+
+
+def test_get_or_create_pending_session_ignores_stale_session(tmp_path):
+    db = TaskSessionDB(base_dir=str(tmp_path))
+    record, _ = db.get_or_create_pending_session("p1")
+
+    # 把已有session的创建时间改到复用窗口之外
+    date_str = db._get_date_str()
+    data = db._load_sessions_for_date(date_str)
+    stale = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    data["sessions"][record["id"]]["created_at"] = stale
+    db._save_sessions_for_date(date_str, data)
+
+    new_record, reused = db.get_or_create_pending_session("p1", reuse_seconds=60)
+    assert reused is False
+    assert new_record["id"] != record["id"]
+
+
+def test_concurrent_creates_from_separate_instances_are_all_persisted(tmp_path):
+    # API服务器每个请求都会新建TaskSessionDB实例，并发写入同一分片文件时不能丢失记录
+    workers = 8
+    barrier = threading.Barrier(workers)
+    created = []
+    created_lock = threading.Lock()
+
+    def create(i):
+        db = TaskSessionDB(base_dir=str(tmp_path))
+        barrier.wait()
+        record, reused = db.get_or_create_pending_session(f"provider-{i}")
+        with created_lock:
+            created.append((record, reused))
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(record is not None and not reused for record, reused in created)
+    db = TaskSessionDB(base_dir=str(tmp_path))
+    persisted = db.list_sessions_by_date(db._get_date_str())
+    assert {s["id"] for s in persisted} == {record["id"] for record, _ in created}
+
+
+def test_concurrent_requests_for_same_provider_create_one_session(tmp_path):
+    workers = 6
+    barrier = threading.Barrier(workers)
+    ids = []
+    ids_lock = threading.Lock()
+
+    def create():
+        db = TaskSessionDB(base_dir=str(tmp_path))
+        barrier.wait()
+        record, _ = db.get_or_create_pending_session("same")
+        with ids_lock:
+            ids.append(record["id"])
+
+    threads = [threading.Thread(target=create) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(ids)) == 1